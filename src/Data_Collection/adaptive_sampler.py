@@ -0,0 +1,69 @@
+"""
+
+Author: Arthur Wesley
+
+adaptive coarse-to-fine search for the transitions in a video
+
+"""
+
+import numpy as np
+
+
+def adaptive_sample(length, classify, initial_step):
+    """
+
+    classifies every segment of a video while only probing the segments
+    near transitions
+
+    the video is first probed every [initial_step] segments. Every interval
+    between two neighbouring probes with different labels is then split at
+    its midpoint and probed again, until the labels only change between
+    adjacent segments. Segments that were never probed take the label of
+    the probe before them
+
+    runs that start and end between two probes with the same label are not
+    found, as with a fixed step of [initial_step]
+
+    :param length: number of segments in the video
+    :param classify: function mapping an array of segment indices to an
+                     array of labels
+    :param initial_step: step between the probes of the first scan
+    :return: array of labels for every segment, number of probes issued
+    """
+
+    labels = np.empty(length, dtype=int)
+
+    if length == 0:
+        return labels, 0
+
+    probed = np.arange(0, length, initial_step)
+
+    # always probe the last segment so the end of the video is covered
+    if probed[-1] != length - 1:
+        probed = np.append(probed, length - 1)
+
+    labels[probed] = classify(probed)
+    probes = len(probed)
+
+    while True:
+
+        left = probed[:-1]
+        right = probed[1:]
+
+        # intervals that contain a transition and can still be split
+        split = (labels[left] != labels[right]) & (right - left > 1)
+
+        if not split.any():
+            break
+
+        midpoints = (left[split] + right[split]) // 2
+
+        labels[midpoints] = classify(midpoints)
+        probes += len(midpoints)
+
+        probed = np.sort(np.concatenate([probed, midpoints]))
+
+    # give every segment the label of the last probe at or before it
+    previous_probe = probed[np.searchsorted(probed, np.arange(length), side="right") - 1]
+
+    return labels[previous_probe], probes
@@ -0,0 +1,374 @@
+"""
+
+Author: Arthur Wesley
+
+asyncio segment downloader that keeps hundreds of segment fetches in
+flight across many videos and decodes them on a pool of threads
+
+"""
+
+import atexit
+import asyncio
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+import aiohttp
+
+from src import constants
+from src.Data_Collection import video_metadata
+from src.Data_Collection import instrumentation
+
+
+class SegmentDownloader:
+
+    def __init__(self,
+                 max_connections=constants.async_max_connections,
+                 max_connections_per_host=constants.async_max_connections_per_host,
+                 decode_workers=constants.decode_workers,
+                 decode_processes=constants.decode_processes):
+        """
+
+        initializes a segment downloader and starts its event loop on a
+        background thread
+
+        :param max_connections: maximum number of segments downloading at once
+        :param max_connections_per_host: maximum number of segments downloading
+                                         from any one host at once
+        :param decode_workers: number of threads (or processes) decoding
+                               segments (None for the default of the pool)
+        :param decode_processes: whether to decode on a pool of processes
+                                 instead of threads
+        """
+
+        self.max_connections = max_connections
+        self.max_connections_per_host = max_connections_per_host
+
+        # the event loop runs forever on its own thread, synchronous callers
+        # submit coroutines to it
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+
+        # created on the event loop the first time it is needed
+        self.session = None
+
+        if decode_processes:
+            # the pool starts its processes lazily from the event loop thread
+            # of a process that already runs tensorflow and thread pools, so
+            # they are spawned rather than forked. Every process imports the
+            # __main__ module and every segment is copied to it, so this is
+            # only worth it when decoding is starved for cores
+            self.decode_pool = ProcessPoolExecutor(max_workers=decode_workers,
+                                                   mp_context=multiprocessing.get_context("spawn"))
+        else:
+            # pyav releases the gil while it decodes, so threads decode in
+            # parallel without copying the segments to other processes
+            self.decode_pool = ThreadPoolExecutor(max_workers=decode_workers,
+                                                  thread_name_prefix="decode")
+
+        # counters (only modified on the event loop)
+        self.segments_downloaded = 0
+        self.bytes_downloaded = 0
+        self.cache_hits = 0
+        self.retries = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.connections_opened = 0
+        self.connections_reused = 0
+
+    async def get_session(self):
+        """
+
+        gets the aiohttp session, creating it on first use
+
+        the connector enforces both the global and the per-host limit
+
+        :return: aiohttp session
+        """
+
+        if self.session is None:
+
+            connector = aiohttp.TCPConnector(limit=self.max_connections,
+                                             limit_per_host=self.max_connections_per_host)
+
+            timeout = aiohttp.ClientTimeout(sock_connect=constants.http_timeout[0],
+                                            sock_read=constants.http_timeout[1])
+
+            # count the connections the connector opens and reuses
+            trace_config = aiohttp.TraceConfig()
+            trace_config.on_connection_create_end.append(self.on_connection_create)
+            trace_config.on_connection_reuseconn.append(self.on_connection_reuse)
+
+            self.session = aiohttp.ClientSession(connector=connector,
+                                                 timeout=timeout,
+                                                 trace_configs=[trace_config])
+
+        return self.session
+
+    async def on_connection_create(self, session, context, params):
+        """
+
+        counts a connection opened by the session
+
+        :param session: session that opened the connection
+        :param context: trace context of the request
+        :param params: parameters of the trace signal
+        :return: None
+        """
+
+        self.connections_opened += 1
+
+    async def on_connection_reuse(self, session, context, params):
+        """
+
+        counts a request that reused an open connection
+
+        :param session: session that sent the request
+        :param context: trace context of the request
+        :param params: parameters of the trace signal
+        :return: None
+        """
+
+        self.connections_reused += 1
+
+    async def fetch(self, url, cache=None):
+        """
+
+        downloads a segment into memory, retrying transient errors
+
+        :param url: url of the segment
+        :param cache: segment cache to check before downloading (optional)
+        :return: bytes of the segment
+        """
+
+        if cache is not None:
+
+            data = await self.loop.run_in_executor(None, cache.get, *segment_key(url))
+
+            if data is not None:
+                self.cache_hits += 1
+                instrumentation.recorder.count("segment cache hits")
+                return data
+
+        session = await self.get_session()
+
+        attempt = 0
+
+        with instrumentation.recorder.span("download", url=url):
+            while True:
+
+                self.in_flight += 1
+                self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+                try:
+                    async with session.get(url) as response:
+                        response.raise_for_status()
+
+                        data = bytearray()
+
+                        # stream the segment into memory
+                        async for chunk in response.content.iter_chunked(constants.async_chunk_size):
+                            data.extend(chunk)
+
+                    break
+
+                except (aiohttp.ClientResponseError, aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+
+                    # only retry server errors and dropped or slow connections
+                    if isinstance(e, aiohttp.ClientResponseError) and e.status < 500:
+                        raise
+
+                    if attempt >= constants.http_retries:
+                        raise
+
+                    self.retries += 1
+                    await asyncio.sleep(constants.http_backoff * 2 ** attempt)
+                    attempt += 1
+
+                finally:
+                    self.in_flight -= 1
+
+        data = bytes(data)
+
+        self.segments_downloaded += 1
+        self.bytes_downloaded += len(data)
+
+        instrumentation.recorder.count("segments fetched")
+        instrumentation.recorder.count("bytes downloaded", len(data))
+
+        if cache is not None:
+            await self.loop.run_in_executor(None, cache.put, *segment_key(url), data)
+
+        return data
+
+    async def process(self, url, decode, args, cache):
+        """
+
+        downloads a segment and decodes it on the decode pool
+
+        :param url: url of the segment
+        :param decode: function of (segment bytes, *args) to run on the segment
+                       (None to return the bytes)
+        :param args: extra arguments to the decode function
+        :param cache: segment cache to check before downloading (optional)
+        :return: result of the decode function
+        """
+
+        data = await self.fetch(url, cache)
+
+        if decode is None:
+            return data
+
+        # timed from the event loop, so the span includes waiting for a
+        # free decoding process
+        with instrumentation.recorder.span("decode", url=url):
+            return await self.loop.run_in_executor(self.decode_pool, decode, data, *args)
+
+    async def process_all(self, jobs, decode, cache):
+        """
+
+        downloads and decodes a list of segments concurrently
+
+        :param jobs: list of (url, args) pairs
+        :param decode: function to run on each segment
+        :param cache: segment cache to check before downloading (optional)
+        :return: list of results in the same order as the jobs
+        """
+
+        return await asyncio.gather(*[self.process(url, decode, args, cache)
+                                      for url, args in jobs])
+
+    def run(self, coroutine):
+        """
+
+        runs a coroutine on the event loop and waits for its result
+
+        must not be called from the event loop thread
+
+        :param coroutine: coroutine to run
+        :return: result of the coroutine
+        """
+
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+    def get_segments(self, urls, cache=None):
+        """
+
+        downloads a list of segments
+
+        :param urls: urls of the segments
+        :param cache: segment cache to check before downloading (optional)
+        :return: list of segment bytes
+        """
+
+        return self.run(self.process_all([(url, ()) for url in urls], None, cache))
+
+    def decode_segments(self, jobs, decode, cache=None):
+        """
+
+        downloads a list of segments and decodes each of them
+
+        :param jobs: list of (url, args) pairs
+        :param decode: function of (segment bytes, *args) to run on each segment
+        :param cache: segment cache to check before downloading (optional)
+        :return: list of results in the same order as the jobs
+        """
+
+        return self.run(self.process_all(jobs, decode, cache))
+
+    def download(self,
+                 items,
+                 decode,
+                 args=(),
+                 quality=constants.quality(constants.dimensions),
+                 cache=None):
+        """
+
+        downloads and decodes segments from many videos at once
+
+        :param items: list of (video ID, segment name) pairs
+        :param decode: function of (segment bytes, *args) to run on each segment
+        :param args: extra arguments to the decode function
+        :param quality: quality of the segments
+        :param cache: segment cache to check before downloading (optional)
+        :return: list of results in the same order as the items
+        """
+
+        jobs = [(video_metadata.get_metadata(video_id).get_base_url(quality) + segment, args)
+                for video_id, segment in items]
+
+        return self.decode_segments(jobs, decode, cache)
+
+    def stats(self):
+        """
+
+        gets the downloader statistics
+
+        :return: dictionary of counters
+        """
+
+        return {
+            "segments": self.segments_downloaded,
+            "bytes": self.bytes_downloaded,
+            "cache hits": self.cache_hits,
+            "retries": self.retries,
+            "max in flight": self.max_in_flight,
+            "connections opened": self.connections_opened,
+            "connections reused": self.connections_reused
+        }
+
+    def close(self):
+        """
+
+        closes the session, stops the event loop and shuts down the decoders
+
+        :return: None
+        """
+
+        if self.session is not None:
+            self.run(self.session.close())
+
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+
+        self.decode_pool.shutdown()
+
+
+def segment_key(url):
+    """
+
+    gets the key that a segment is cached under from its url
+
+    segment urls end in /[video]/[quality]/[segment]
+
+    :param url: url of the segment
+    :return: tuple: video, quality, segment
+    """
+
+    video, quality, segment = url.split("/")[-3:]
+
+    return video, quality, segment
+
+
+downloader = None
+downloader_lock = threading.Lock()
+
+
+def get_downloader(**kwargs):
+    """
+
+    gets the shared segment downloader, creating it on first use
+
+    :param kwargs: arguments to the SegmentDownloader if it is created
+    :return: SegmentDownloader
+    """
+
+    global downloader
+
+    with downloader_lock:
+        if downloader is None:
+            downloader = SegmentDownloader(**kwargs)
+            atexit.register(downloader.close)
+
+    return downloader
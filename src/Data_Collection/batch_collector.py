@@ -0,0 +1,210 @@
+"""
+
+Author: Arthur Wesley
+
+collects the winners of many videos at once over a pool of processes
+
+"""
+
+import os
+import json
+import time as t
+import traceback
+import multiprocessing
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from src import constants
+from src.Data_Collection import async_downloader
+from src.Data_Collection import instrumentation
+
+# models loaded once by each worker process
+worker_models = None
+
+
+def init_worker(coarse, decode_workers):
+    """
+
+    loads the models into a worker process
+
+    :param coarse: whether to also load the 160p game classifier
+    :param decode_workers: number of decoding threads each worker uses
+    :return: None
+    """
+
+    # tensorflow is only imported by the workers, which are spawned rather
+    # than forked from a process that already holds its threads
+    from tensorflow.keras import models
+
+    global worker_models
+
+    worker_models = {
+        "classifier": models.load_model(constants.game_classifier),
+        "crewmate_identifier": models.load_model(constants.crewmate_identifier)
+    }
+
+    if coarse:
+        worker_models["coarse_classifier"] = models.load_model(constants.game_classifier_160p)
+
+    # the worker processes already use every core, so each one decodes on a
+    # few threads of its own rather than spawning a decode pool
+    async_downloader.get_downloader(decode_workers=decode_workers, decode_processes=False)
+
+
+def collect(video_id, trace=False, **kwargs):
+    """
+
+    collects the winners of a single video with the worker's models
+
+    :param video_id: ID of the video
+    :param trace: whether to write the spans and counters of the video to
+                  constants.trace_directory
+    :param kwargs: arguments to the DataCollector
+    :return: dictionary describing the result
+    """
+
+    # the data collector imports tensorflow, so it is only imported by the
+    # workers as well
+    from src.Data_Collection.data_collector import DataCollector
+
+    t0 = t.time()
+
+    # each worker collects one video at a time, so the recorder of the
+    # process only holds this video
+    instrumentation.recorder.reset()
+
+    result = {
+        "video_id": video_id,
+        "pid": os.getpid()
+    }
+
+    try:
+        collector = DataCollector(video_id,
+                                  verbose=False,
+                                  **worker_models,
+                                  **kwargs)
+
+        winners = collector.get_winners()
+
+        result["winners"] = [np.asarray(winner).tolist() for winner in winners]
+        result["games"] = len(winners)
+        result["stages"] = collector.stage_stats
+
+        if collector.prediction_cache is not None:
+            result["prediction cache"] = collector.prediction_cache.stats()
+
+        result["instrumentation"] = instrumentation.recorder.summary()
+
+        if trace:
+            collector.write_trace()
+
+        result["error"] = None
+
+    except Exception as e:
+        result["winners"] = []
+        result["games"] = 0
+        result["error"] = repr(e)
+        result["traceback"] = traceback.format_exc()
+
+    result["time"] = t.time() - t0
+
+    return result
+
+
+def collect_all(video_ids,
+                processes=None,
+                decode_workers=1,
+                verbose=True,
+                trace=False,
+                **kwargs):
+    """
+
+    collects the winners of every video over a pool of processes
+
+    :param video_ids: IDs of the videos
+    :param processes: number of worker processes (None for one per core)
+    :param decode_workers: number of decoding threads each worker uses
+    :param verbose: whether to print each video as it finishes
+    :param trace: whether to write the spans and counters of each video to
+                  constants.trace_directory
+    :param kwargs: arguments to each DataCollector
+    :return: report merging the results of every video
+    """
+
+    if processes is None:
+        processes = os.cpu_count()
+
+    t0 = t.time()
+
+    results = []
+
+    with ProcessPoolExecutor(max_workers=processes,
+                             mp_context=multiprocessing.get_context("spawn"),
+                             initializer=init_worker,
+                             initargs=(kwargs.get("coarse", False), decode_workers)) as pool:
+
+        for result in pool.map(partial(collect, trace=trace, **kwargs), video_ids):
+
+            results.append(result)
+
+            if verbose:
+                if result["error"] is None:
+                    print("found", result["games"], "games in", result["video_id"],
+                          "in", result["time"], "seconds")
+                else:
+                    print("failed to collect", result["video_id"] + ":", result["error"])
+
+    wall_time = t.time() - t0
+
+    # total time spent on each video, whichever process it ran on
+    video_time = sum(result["time"] for result in results)
+
+    return {
+        "processes": processes,
+        "videos": len(results),
+        "failures": sum(result["error"] is not None for result in results),
+        "games": sum(result["games"] for result in results),
+        "wall time": wall_time,
+        "videos per hour": 3600 * len(results) / wall_time,
+        # 1 when every process was busy for the whole run
+        "parallel efficiency": video_time / (wall_time * processes),
+        "results": results
+    }
+
+
+def write_report(report, path):
+    """
+
+    writes a report to a JSON file
+
+    :param report: report from collect_all
+    :param path: path to the file
+    :return: None
+    """
+
+    with open(path, "w") as file:
+        json.dump(report, file, indent=4)
+
+
+def main():
+    """
+
+    main method
+
+    :return:
+    """
+
+    games = [line.strip() for line in open("games.txt") if line.strip()]
+
+    report = collect_all(games, step=2, checkpoint=True)
+
+    write_report(report, os.path.join("results", "batch report.json"))
+
+    print("collected", report["games"], "games from", report["videos"], "videos in",
+          report["wall time"], "seconds with", report["failures"], "failures")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+"""
+
+Author: Arthur Wesley
+
+resumable checkpoints of the state of a DataCollector
+
+"""
+
+import os
+import json
+import time as t
+
+import numpy as np
+
+
+class Checkpoint:
+
+    def __init__(self, directory, video_id, settings):
+        """
+
+        initializes the checkpoint of a video, stored as an array file and a
+        JSON manifest in the directory
+
+        a checkpoint is only resumed by a collector with the same settings,
+        since the step and resolution decide which frames the arrays hold
+
+        :param directory: directory to store the checkpoint in
+        :param video_id: ID of the video
+        :param settings: dictionary of the collector settings
+        """
+
+        self.directory = directory
+        self.video_id = video_id
+        self.settings = settings
+
+        self.manifest_path = os.path.join(directory, video_id + ".json")
+        self.array_path = os.path.join(directory, video_id + ".npz")
+
+        self.manifest = self.new_manifest()
+        self.arrays = {}
+
+    def new_manifest(self):
+        """
+
+        creates the manifest of a checkpoint with nothing done yet
+
+        :return: manifest dictionary
+        """
+
+        return {
+            "video_id": self.video_id,
+            "settings": self.settings,
+            # stages of the collector that have finished
+            "stages": [],
+            # number of vods classified and transition windows scanned
+            "classified": 0,
+            "windows": 0,
+            "updated": None
+        }
+
+    def load(self):
+        """
+
+        loads the checkpoint from the directory
+
+        :return: whether a checkpoint with the same settings was found
+        """
+
+        if not (os.path.exists(self.manifest_path) and os.path.exists(self.array_path)):
+            return False
+
+        with open(self.manifest_path) as file:
+            manifest = json.load(file)
+
+        if manifest["settings"] != self.settings:
+            return False
+
+        with np.load(self.array_path) as arrays:
+            self.arrays = {name: arrays[name] for name in arrays.files}
+
+        self.manifest = manifest
+
+        return True
+
+    def completed(self, stage):
+        """
+
+        checks whether a stage of the collector has finished
+
+        :param stage: name of the stage
+        :return: whether the stage finished
+        """
+
+        return stage in self.manifest["stages"]
+
+    def get(self, name):
+        """
+
+        gets an array from the checkpoint
+
+        :param name: name of the array
+        :return: array, None if the checkpoint does not have it
+        """
+
+        return self.arrays.get(name)
+
+    def save(self, stage=None, **kwargs):
+        """
+
+        updates the checkpoint and writes it to the directory
+
+        the arrays are written before the manifest, and each file is written
+        to a temporary file and then renamed over the old one, so a crash
+        never leaves a manifest describing arrays that were not written.
+        The array file is only rewritten when arrays are given
+
+        :param stage: stage that just finished (None if it is still running)
+        :param kwargs: arrays to store and manifest fields to update
+        :return: None
+        """
+
+        arrays = {name: value for name, value in kwargs.items() if isinstance(value, np.ndarray)}
+
+        for name, value in kwargs.items():
+            if name in arrays:
+                self.arrays[name] = value
+            else:
+                self.manifest[name] = value
+
+        if stage is not None and stage not in self.manifest["stages"]:
+            self.manifest["stages"].append(stage)
+
+        self.manifest["updated"] = t.time()
+
+        os.makedirs(self.directory, exist_ok=True)
+
+        if arrays or not os.path.exists(self.array_path):
+            write_arrays(self.array_path, self.arrays)
+
+        with open(self.manifest_path + ".tmp", "w") as file:
+            json.dump(self.manifest, file, indent=4)
+
+        os.replace(self.manifest_path + ".tmp", self.manifest_path)
+
+    def window_path(self, window):
+        """
+
+        gets the path of the arrays of a transition window
+
+        :param window: number of the window (starting at 1)
+        :return: path to the array file
+        """
+
+        return os.path.join(self.directory, self.video_id + ".window-" + str(window) + ".npz")
+
+    def save_window(self, window, **arrays):
+        """
+
+        writes the arrays of a transition window to their own file and then
+        records the window in the manifest
+
+        each window is written once, so the checkpoint I/O grows linearly
+        with the number of windows. A crash after the window file is written
+        leaves a window the manifest does not count, which is ignored and
+        written again on resume
+
+        :param window: number of the window (starting at 1)
+        :param arrays: arrays of the window
+        :return: None
+        """
+
+        os.makedirs(self.directory, exist_ok=True)
+
+        write_arrays(self.window_path(window), arrays)
+
+        self.save(windows=window)
+
+    def get_windows(self):
+        """
+
+        loads the arrays of every transition window counted by the manifest
+
+        :return: list of dictionaries of arrays, one per window
+        """
+
+        windows = []
+
+        for window in range(1, self.manifest["windows"] + 1):
+            with np.load(self.window_path(window)) as arrays:
+                windows.append({name: arrays[name] for name in arrays.files})
+
+        return windows
+
+    def remove(self):
+        """
+
+        deletes the checkpoint from the directory
+
+        :return: None
+        """
+
+        for path in (self.manifest_path, self.array_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+        if os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                if name.startswith(self.video_id + ".window-"):
+                    os.remove(os.path.join(self.directory, name))
+
+        self.manifest = self.new_manifest()
+        self.arrays = {}
+
+
+def write_arrays(path, arrays):
+    """
+
+    writes arrays to a temporary file and renames it over the old file
+
+    :param path: path to the array file
+    :param arrays: dictionary of arrays
+    :return: None
+    """
+
+    with open(path + ".tmp", "wb") as file:
+        np.savez(file, **arrays)
+
+    os.replace(path + ".tmp", path)
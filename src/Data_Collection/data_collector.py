@@ -7,22 +7,33 @@ data collection program
 """
 
 import os
-import time as t
 import random
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 
 import numpy as np
 from scipy import stats
 
-from twitchdl import twitch
-
 from tensorflow.keras import models
 from tensorflow.keras.preprocessing.image import save_img
 
-from PIL import Image
-
 from src import constants
 from src.Data_Collection import web_scrapper
-from src.Preprocessing import cropper
+from src.Data_Collection import async_downloader
+from src.Data_Collection import http_session
+from src.Data_Collection import video_metadata
+from src.Data_Collection import adaptive_sampler
+from src.Data_Collection import transitions
+from src.Data_Collection import smoothing
+from src.Data_Collection import scene_filter
+from src.Data_Collection import frame_buffer
+from src.Data_Collection import instrumentation
+from src.Data_Collection import winner_vote
+from src.Data_Collection.checkpoint import Checkpoint
+from src.Data_Collection import prediction_store
+from src.Data_Collection.prediction_store import PredictionStore
+from src.Data_Collection.prediction_cache import PredictionCache
+from src.Data_Collection.pipeline import DownloadPipeline
 
 temp_images = os.path.join("Data", "Temp Images")
 
@@ -34,7 +45,23 @@ class DataCollector:
                  step=2,
                  end_transition_step=constants.end_transition_step,
                  verbose=True,
-                 batch_size=32):
+                 batch_size=32,
+                 workers=constants.download_workers,
+                 queue_depth=None,
+                 coarse=False,
+                 keyframes=True,
+                 classifier=None,
+                 crewmate_identifier=None,
+                 coarse_classifier=None,
+                 adaptive_step=None,
+                 streaming=False,
+                 early_exit=False,
+                 weighted_voting=False,
+                 checkpoint=False,
+                 store=False,
+                 smooth=False,
+                 dedup=False,
+                 use_scene_filter=False):
         """
 
         initializes a DataCollector from a specified video ID
@@ -42,41 +69,135 @@ class DataCollector:
         :param video_id: ID of the video to seek through
         :param step: step between images
         :param batch_size: size of the batches that the video is processed in
+        :param workers: number of segment downloads to keep in flight at once
+        :param queue_depth: maximum number of downloaded frames waiting to be
+                            classified (defaults to two batches)
+        :param coarse: whether to classify the game state from 160p frames and
+                       only fetch 360p frames in the windows at the end of
+                       each game
+        :param keyframes: whether to scan the first keyframe of each segment
+                          instead of decoding its first frame in full
+        :param classifier: game classifier to use (loaded from
+                           constants.game_classifier if None)
+        :param crewmate_identifier: crewmate identifier to use (loaded from
+                                    constants.crewmate_identifier if None)
+        :param coarse_classifier: 160p game classifier to use (loaded from
+                                  constants.game_classifier_160p if None)
+        :param adaptive_step: if set, probe every [adaptive_step] segments and
+                              refine only around transitions, down to single
+                              segments, instead of sampling every [step]
+        :param streaming: whether to classify one transition window at a time
+                          and only keep the frames predicted to be end screens
+        :param early_exit: whether to stop scanning each transition window once
+                           enough end screens have been found (implies streaming)
+        :param weighted_voting: whether to pick winners by summing the log
+                                probabilities of each color, sampling frames
+                                only until the vote is decisive
+        :param checkpoint: whether to save the predictions to a checkpoint
+                           after every batch and resume from it if one exists
+        :param store: whether to keep the probabilities of every classified
+                      frame in the prediction store and read them back
+                      instead of downloading and classifying frames again
+                      (implies streaming)
+        :param smooth: whether to smooth the game classifier predictions with
+                       a hidden markov model before finding the transitions
+        :param dedup: whether to reuse the prediction of a recent frame with
+                      the same perceptual hash instead of classifying it
+        :param use_scene_filter: whether to only classify the vods at scene
+                                 changes (and a sparse keep-alive sample),
+                                 giving every other vod the label of the one
+                                 before it
         """
 
         # copy the parameters into the object
         self.video_id = video_id
         self.verbose = verbose
         self.batch_size = batch_size
+        self.workers = workers
+
+        if queue_depth is None:
+            queue_depth = 2 * batch_size
+
+        self.queue_depth = queue_depth
+
+        # thread pool that downloads and decodes segments concurrently
+        self.executor = ThreadPoolExecutor(max_workers=workers)
 
         # set the steps
         self.step = step
         self.end_transition_step = end_transition_step
 
-        # load NNs
-        self.classifier = models.load_model(constants.game_classifier)
-        self.crewmate_identifier = models.load_model(constants.crewmate_identifier)
+        # load NNs (unless they were already loaded by the caller)
+        if classifier is None:
+            classifier = models.load_model(constants.game_classifier)
+        if crewmate_identifier is None:
+            crewmate_identifier = models.load_model(constants.crewmate_identifier)
+
+        self.classifier = classifier
+        self.crewmate_identifier = crewmate_identifier
+
+        # get video information & vods (fetched once per video)
+        self.metadata = video_metadata.get_metadata(video_id)
+
+        self.url = self.metadata.get_base_url()
+        self.full_vods = self.metadata.get_vods()
+
+        self.keyframes = keyframes
+
+        # the coarse scan reads the same segments from the 160p variant
+        self.coarse = coarse
+
+        if coarse:
+            if coarse_classifier is None:
+                coarse_classifier = models.load_model(constants.game_classifier_160p)
+
+            self.coarse_classifier = coarse_classifier
+            self.coarse_url = self.metadata.get_base_url(constants.quality(constants.res_160p))
 
-        # get video information & vods
-        self.access_token = twitch.get_access_token(video_id)
+        # with an adaptive step every vod is classified, most of them by
+        # the probe before them
+        self.adaptive_step = adaptive_step
 
-        self.url = web_scrapper.get_base_url(self.video_id, self.access_token)
-        self.full_vods = web_scrapper.get_vods(self.video_id, self.access_token)
+        if adaptive_step is not None:
+            self.step = 1
+
+        # number of segments the classifier was run on
+        self.probes = None
 
         # take every [step] vods
         self.vods = self.full_vods[::self.step]
 
         self.vods = [(vod, 0) for vod in self.vods]
 
-        # batches object (initially None)
-        self.batches = None
-
         # transitions object
         self.transitions = None
 
+        # run-length encoded predictions (starts, lengths, labels)
+        self.runs = None
+
         # game_classifier_predictions object
         self.game_classifier_predictions = None
 
+        # softmax outputs behind the predictions (NaN for vods that were
+        # never classified)
+        self.game_classifier_probabilities = None
+
+        # whether to only classify vods at scene changes, and how many were
+        # classified
+        self.use_scene_filter = use_scene_filter
+        self.scene_stats = None
+
+        # whether to smooth the predictions, and the transition windows that
+        # smoothing avoided
+        self.smooth = smooth
+        self.smoothing_stats = None
+
+        # statistics from the download/inference pipeline
+        self.pipeline_stats = None
+
+        # stage name -> seconds taken and bytes downloaded during that stage
+        self.stage_stats = {}
+
         # object containing all of the games in the stream
         self.games = None
 
@@ -86,6 +207,132 @@ class DataCollector:
         # transition predictions
         self.transition_predictions = None
 
+        # in streaming mode only the end screen frames of the transition
+        # windows are kept, along with their indices in the predictions
+        self.streaming = streaming or early_exit or store
+        self.end_screen_frames = None
+        self.end_screen_indices = None
+
+        # segment and frame of every transition prediction, and the index of
+        # the first prediction of each transition window (short segments and
+        # early exits make the windows different lengths)
+        self.transition_segments = None
+        self.transition_frames = None
+        self.transition_offsets = None
+
+        # whether to stop scanning a window once its end screen has been found,
+        # and the segments and frames each scan took against the full window
+        self.early_exit = early_exit
+        self.scan_stats = None
+
+        # how the winners are voted on, and the frames the last vote used
+        self.weighted_voting = weighted_voting
+        self.vote_stats = None
+
+        # predictions of recently classified frames, keyed by their hash
+        self.prediction_cache = None
+
+        if dedup:
+            self.prediction_cache = PredictionCache()
+
+        # probabilities of every classified frame, kept across runs
+        self.store = None
+
+        if store:
+            self.store = PredictionStore(constants.prediction_store_directory)
+
+            # tables of the game classifier at the scanning resolution and at
+            # the resolution of the transition windows
+            self.transition_table = prediction_store.table_name(constants.dimensions, self.classifier)
+
+            if coarse:
+                self.scan_table = prediction_store.table_name(constants.res_160p, self.coarse_classifier)
+            else:
+                self.scan_table = self.transition_table
+
+        # resumable checkpoint of the predictions, saved after every batch
+        self.checkpoint = None
+
+        if checkpoint:
+            self.checkpoint = Checkpoint(constants.checkpoint_directory,
+                                         video_id,
+                                         {
+                                             "step": self.step,
+                                             "end transition step": end_transition_step,
+                                             "coarse": coarse,
+                                             "keyframes": keyframes,
+                                             "adaptive step": adaptive_step,
+                                             "early exit": early_exit,
+                                             "smooth": smooth,
+                                             "scene filter": use_scene_filter,
+                                             "vods": len(self.full_vods)
+                                         })
+            self.resume()
+
+    def resume(self):
+        """
+
+        restores the predictions of every stage in the checkpoint
+
+        vods that were classified before the checkpoint was saved are not
+        downloaded again, and a stage that finished is skipped entirely
+
+        :return: None
+        """
+
+        if self.checkpoint.load():
+
+            if self.checkpoint.completed("game classification"):
+                self.game_classifier_predictions = self.checkpoint.get("game_classifier_predictions")
+                self.game_classifier_probabilities = self.checkpoint.get("game_classifier_probabilities")
+                self.probes = self.checkpoint.manifest["probes"]
+
+            # only the end screens are kept, as in streaming mode
+            if self.checkpoint.completed("transition predictions"):
+                self.transition_predictions = self.checkpoint.get("transition_predictions")
+                self.end_screen_frames = self.checkpoint.get("end_screen_frames")
+                self.end_screen_indices = self.checkpoint.get("end_screen_indices")
+                self.transition_segments = self.checkpoint.get("transition_segments")
+                self.transition_frames = self.checkpoint.get("transition_frames")
+                self.transition_offsets = self.checkpoint.get("transition_offsets")
+
+            if self.verbose:
+                print("resuming", self.video_id, "from a checkpoint with",
+                      self.checkpoint.manifest["classified"], "vods classified,",
+                      self.checkpoint.manifest["windows"], "transition windows scanned and",
+                      self.checkpoint.manifest["stages"], "finished")
+
+        # probabilities of every vod, NaN until it has been classified
+        if self.checkpoint.get("vod_probabilities") is None:
+            self.checkpoint.arrays["vod_probabilities"] = np.full((len(self.vods), len(constants.label_ids)),
+                                                                  np.nan,
+                                                                  dtype=np.float32)
+
+    def save_batch(self, indices, probabilities):
+        """
+
+        saves the predictions of a batch of vods to the prediction store and
+        the checkpoint
+
+        :param indices: indices of the vods
+        :param probabilities: class probabilities of the vods
+        :return: None
+        """
+
+        if self.store is not None:
+            self.store.append(self.video_id,
+                              self.scan_table,
+                              indices * self.step,
+                              [self.vods[i][1] for i in indices],
+                              probabilities)
+
+        if self.checkpoint is not None:
+            vod_probabilities = self.checkpoint.get("vod_probabilities")
+            vod_probabilities[indices] = probabilities
+
+            self.checkpoint.save(vod_probabilities=vod_probabilities,
+                                 classified=int(np.sum(~np.isnan(vod_probabilities[:, 0]))))
+
     def get_image(self, vod):
         """
 
@@ -95,64 +342,378 @@ class DataCollector:
         :return: None
         """
 
-        # get the image and assign it
-        return web_scrapper.get_still_frame(self.url + vod[0],
-                                             vod[1])
+        return self.get_frame(self.url, vod)
 
-    def get_game_class_batch(self):
+    def get_coarse_image(self, vod):
         """
 
-        puts all of the images into the vods tensor
+        gets the 160p image at the specified index
 
-        :return:
+        :param vod: vod to get
+        :return: image
         """
 
-        t0 = t.time()
+        return self.get_frame(self.coarse_url, vod)
 
-        self.batches = [self.vods[i:i + self.batch_size]
-                        for i in range(0, len(self.vods), self.batch_size)]
+    def get_frame(self, url, vod):
+        """
 
-        self.game_classifier_predictions = np.empty((len(self.vods)))
+        gets the image at the specified index of a vod
 
-        for index, batch in enumerate(self.batches):
+        segments start on a keyframe, so the first frame is read with the
+        keyframe decoder in keyframe mode
 
-            start_index = self.batch_size * index
-            end_index = start_index + len(batch)
-            
-            print(start_index)
+        :param url: base url of the vods
+        :param vod: vod to get
+        :return: image
+        """
 
-            # get the tensor
-            vods_tensor = self.get_batch(batch)
+        if self.keyframes and vod[1] == 0:
+            return web_scrapper.get_keyframe(url + vod[0])
+        else:
+            return web_scrapper.get_still_frame(url + vod[0],
+                                                 vod[1])
 
-            # update the game classifier predictions
-            self.game_classifier_predictions[start_index:end_index] = np.argmax(self.classifier.predict(vods_tensor), axis=1)
+    @contextmanager
+    def stage(self, name):
+        """
 
-        t1 = t.time()
+        runs a stage of the collector inside a span, recording the time the
+        span took and the bytes downloaded during it, along with the peak
+        memory of the process so far
 
-        if self.verbose:
-            print("downloading the images took", t1 - t0)
+        :param name: name of the stage
+        :return: span of the stage
+        """
 
-    def get_batch(self, batch):
+        bytes0 = async_downloader.get_downloader().bytes_downloaded
+
+        with instrumentation.recorder.span(name) as span:
+            yield span
+
+        span["args"]["bytes"] = async_downloader.get_downloader().bytes_downloaded - bytes0
+
+        self.stage_stats[name] = {
+            "time": span["duration"],
+            "bytes": span["args"]["bytes"],
+            "peak memory": frame_buffer.peak_memory()
+        }
+
+    def bytes_downloaded(self):
+        """
+
+        gets the total number of bytes downloaded by every recorded stage
+
+        :return: number of bytes
+        """
+
+        return sum(stage["bytes"] for stage in self.stage_stats.values())
+
+    def write_trace(self, directory=constants.trace_directory):
         """
 
-        put the specified batch into the vods_tensor
+        writes the spans and counters recorded in this process to
+        [video id].jsonl and to the chrome trace [video id].trace.json
+
+        :param directory: directory to write the files to
+        :return: None
+        """
+
+        instrumentation.recorder.write_json_lines(os.path.join(directory, self.video_id + ".jsonl"))
+        instrumentation.recorder.write_chrome_trace(os.path.join(directory, self.video_id + ".trace.json"))
+
+    def classify_vods(self, indices):
+        """
+
+        classifies a list of vods, downloading frames on the worker threads
+        while the classifier processes the frames that have already arrived
+
+        vods that the checkpoint or the prediction store already has
+        predictions for are not downloaded again, and each batch is saved to
+        them as soon as it is classified
+
+        :param indices: indices of the vods to classify
+        :return: array of class probabilities, in the same order as the indices
+        """
+
+        indices = np.asarray(indices, dtype=int)
+
+        if self.checkpoint is None:
+            probabilities = np.full((len(indices), len(constants.label_ids)), np.nan, dtype=np.float32)
+        else:
+            probabilities = self.checkpoint.get("vod_probabilities")[indices]
+
+        if self.store is not None:
+            missing = np.flatnonzero(np.isnan(probabilities[:, 0]))
+
+            stored, found = self.store.lookup(self.video_id,
+                                              self.scan_table,
+                                              indices[missing] * self.step,
+                                              [self.vods[i][1] for i in indices[missing]])
+
+            probabilities[missing[found]] = stored[found]
+
+            if self.verbose:
+                print("found", np.sum(found), "of", len(missing), "vods in the prediction store")
+
+        # positions of the vods that still need to be classified
+        remaining = np.flatnonzero(np.isnan(probabilities[:, 0]))
+
+        if len(remaining) == 0:
+            return probabilities
+
+        on_batch = None
+
+        if self.checkpoint is not None or self.store is not None:
+            on_batch = lambda batch, batch_probabilities: self.save_batch(indices[remaining[batch]],
+                                                                          batch_probabilities)
+
+        fetch, classifier, dimensions = self.get_classifier_input()
+
+        pipeline = DownloadPipeline(fetch,
+                                    [self.vods[i] for i in indices[remaining]],
+                                    self.executor,
+                                    self.workers,
+                                    self.queue_depth)
+
+        probabilities[remaining] = pipeline.run(lambda tensor: self.predict_probabilities(classifier, tensor),
+                                                self.batch_size,
+                                                dimensions,
+                                                on_batch)
+        self.pipeline_stats = pipeline.stats
+
+        return probabilities
+
+    def get_classifier_input(self):
+        """
+
+        gets the function that fetches the vods for game classification, the
+        classifier that they go through and their dimensions
+
+        :return: fetch function, classifier, dimensions
+        """
+
+        if self.coarse:
+            return self.get_coarse_image, self.coarse_classifier, constants.res_160p
+        else:
+            return self.get_image, self.classifier, constants.dimensions
+
+    def get_scene_features(self):
+        """
+
+        downloads every vod and computes the features that scene changes are
+        detected from, without running the classifier
+
+        :return: array of features, one row per vod
+        """
+
+        fetch, classifier, dimensions = self.get_classifier_input()
+
+        pipeline = DownloadPipeline(fetch,
+                                    self.vods,
+                                    self.executor,
+                                    self.workers,
+                                    self.queue_depth)
+
+        features = pipeline.run(scene_filter.scene_features,
+                                self.batch_size,
+                                dimensions)
+        self.pipeline_stats = pipeline.stats
+
+        return features
+
+    def classify_scenes(self):
+        """
+
+        classifies the first vod of every scene (and every
+        [scene_keep_alive] vods), giving every other vod the probabilities
+        of the last vod classified before it
+
+        the vods that are classified are read again from the segment cache
+
+        :return: array of class probabilities, one row per vod
+        """
+
+        changes = scene_filter.scene_changes(self.get_scene_features())
+        selected = scene_filter.select_frames(len(self.vods), changes)
+
+        probabilities = self.classify_vods(selected)
+
+        self.scene_stats = {
+            "vods": len(self.vods),
+            "scene changes": len(changes),
+            "vods classified": len(selected)
+        }
+
+        return probabilities[scene_filter.inherit(len(self.vods), selected)]
+
+    def evaluate_scene_filter(self):
+        """
+
+        measures the scene change detector against classifying every vod
+
+        :return: dictionary of the precision and recall of the scene changes
+                 against the transitions of the full classification, and the
+                 fraction of vods that the filtered labels got right
+        """
+
+        labels = np.argmax(self.classify_vods(np.arange(len(self.vods))), axis=1)
+
+        changes = scene_filter.scene_changes(self.get_scene_features())
+        selected = scene_filter.select_frames(len(self.vods), changes)
+
+        filtered = labels[selected][scene_filter.inherit(len(self.vods), selected)]
+
+        evaluation = scene_filter.evaluate(changes, labels)
+
+        evaluation["label agreement"] = np.mean(filtered == labels) if len(labels) else 1.0
+        evaluation["vods classified"] = len(selected)
+        evaluation["vods"] = len(self.vods)
+
+        return evaluation
+
+    def predict_probabilities(self, model, tensor):
+        """
+
+        runs a classifier on a uint8 tensor of frames, through the prediction
+        cache if there is one
+
+        :param model: model to classify the frames with
+        :param tensor: uint8 frames
+        :return: array of class probabilities (frames, classes)
+        """
+
+        if self.prediction_cache is None:
+            return frame_buffer.predict_probabilities(model, tensor, self.batch_size)
+        else:
+            return self.prediction_cache.predict(model, tensor, self.batch_size)
+
+    def classify_probes(self, indices):
+        """
+
+        classifies the vods probed by the adaptive sampler, keeping their
+        probabilities
+
+        :param indices: indices of the vods to classify
+        :return: array of labels, in the same order as the indices
+        """
+
+        probabilities = self.classify_vods(indices)
+        self.game_classifier_probabilities[indices] = probabilities
+
+        return np.argmax(probabilities, axis=1)
+
+    def get_game_class_batch(self):
+        """
+
+        classifies every vod
 
-        :param batch: batch to put into the vods tensor
         :return:
         """
 
-        vods_tensor = np.empty((len(batch),) + constants.dimensions + (3,))
+        with self.stage("game classification") as span:
+
+            if self.adaptive_step is None and self.use_scene_filter:
+                self.game_classifier_probabilities = self.classify_scenes()
+                self.game_classifier_predictions = np.argmax(self.game_classifier_probabilities, axis=1)
+                self.probes = self.scene_stats["vods classified"]
+            elif self.adaptive_step is None:
+                self.game_classifier_probabilities = self.classify_vods(np.arange(len(self.vods)))
+                self.game_classifier_predictions = np.argmax(self.game_classifier_probabilities, axis=1)
+                self.probes = len(self.vods)
+            else:
+                self.game_classifier_probabilities = np.full((len(self.vods), len(constants.label_ids)),
+                                                             np.nan,
+                                                             dtype=np.float32)
+
+                self.game_classifier_predictions, self.probes = \
+                    adaptive_sampler.adaptive_sample(len(self.vods),
+                                                     self.classify_probes,
+                                                     self.adaptive_step)
+
+            if self.smooth:
+                self.smooth_predictions()
+
+            if self.checkpoint is not None:
+                self.checkpoint.save("game classification",
+                                     game_classifier_predictions=self.game_classifier_predictions,
+                                     game_classifier_probabilities=self.game_classifier_probabilities,
+                                     probes=self.probes)
+
+        if self.verbose:
+            print("downloading and classifying the images took", span["duration"])
+            print(self.pipeline_stats)
+            print(web_scrapper.segment_cache)
+            print("downloads:", async_downloader.get_downloader().stats())
+            print("playlist connections:", http_session.connection_stats())
+
+            if self.prediction_cache is not None:
+                print(self.prediction_cache)
 
-        for i, vod in enumerate(batch):
-            vods_tensor[i] = self.get_image(vod)
+            if self.scene_stats is not None:
+                print("scene filter:", self.scene_stats)
 
-        return vods_tensor
+            if self.adaptive_step is not None:
+                print("adaptive search probed", self.probes, "segments, a fixed step of 1 probes",
+                      len(self.vods), "and a fixed step of", self.adaptive_step, "probes",
+                      len(self.vods[::self.adaptive_step]))
+
+    def smooth_predictions(self):
+        """
+
+        replaces the game classifier predictions with the most likely
+        sequence of game states under a hidden markov model, so that a single
+        misclassified vod does not create a pair of transitions
+
+        vods that the adaptive sampler skipped have no probabilities and are
+        decided by the vods around them
+
+        :return: None
+        """
+
+        raw_predictions = self.game_classifier_predictions
+        raw_windows = self.get_window_starts(raw_predictions)
+
+        self.game_classifier_predictions = smoothing.viterbi(self.game_classifier_probabilities,
+                                                             smoothing.transition_matrix())
+
+        windows = self.get_window_starts(self.game_classifier_predictions)
+
+        avoided = np.setdiff1d(raw_windows, windows)
+
+        self.smoothing_stats = {
+            "raw transitions": int(np.sum(np.diff(raw_predictions) != 0)),
+            "transitions": int(np.sum(np.diff(self.game_classifier_predictions) != 0)),
+            "raw windows": len(raw_windows),
+            "windows": len(windows),
+            "windows avoided": len(avoided),
+            "segments avoided": int(sum(len(self.full_vods[index:index + 2 * self.step]) for index in avoided)),
+            # filled in from the time the remaining windows took
+            "download time saved": None
+        }
+
+    def get_window_starts(self, predictions):
+        """
+
+        gets the vods that the transition windows of a set of predictions
+        would start at
+
+        :param predictions: array of labels of the vods
+        :return: array of indices in full_vods
+        """
+
+        starts, lengths, labels = transitions.run_length_encode(predictions)
+
+        return starts[transitions.game_end_runs(labels)] * self.step
 
     def get_transitions(self):
         """
 
         generates a list of every transition in the game
 
+        the predictions are run-length encoded into self.runs, and the start
+        of every run becomes a transition
+
         :return: list of each transition in the game
         """
 
@@ -160,21 +721,18 @@ class DataCollector:
         if self.game_classifier_predictions is None:
             self.get_game_class_batch()
 
-        t0 = t.time()
+        with instrumentation.recorder.span("transition search") as span:
 
-        self.transitions = list()
+            # arrays of the start, length and label of each run of predictions
+            self.runs = transitions.run_length_encode(self.game_classifier_predictions)
 
-        for i in range(len(self.game_classifier_predictions)):
+            starts, lengths, labels = self.runs
 
-            # if we experienced a transition
-            if self.game_classifier_predictions[i] != self.game_classifier_predictions[i - 1]:
-                self.transitions.append((constants.label_ids[self.game_classifier_predictions[i]],
-                                         i * self.step))
-
-        t1 = t.time()
+            self.transitions = [(constants.label_ids[label], start)
+                                for label, start in zip(labels, starts * self.step)]
 
         if self.verbose:
-            print("finding the transitions took", t1 - t0)
+            print("finding the transitions took", span["duration"])
 
     def get_game_transitions(self):
         """
@@ -188,20 +746,17 @@ class DataCollector:
         if self.transitions is None:
             self.get_transitions()
 
-        t0 = t.time()
-
-        game_transitions = []
+        with instrumentation.recorder.span("game transition search") as span:
 
-        for i in range(len(self.transitions)):
+            starts, lengths, labels = self.runs
 
-            # if this image is a lobby and the last image was not a lobby or other
-            if self.transitions[i][0] == "Lobby" and self.transitions[i - 1][0] in ("Gameplay", "Meeting", "Over"):
-                game_transitions.append(self.transitions[i - 1])
+            # runs of gameplay, meetings or end screens followed by a lobby
+            ends = transitions.game_end_runs(labels)
 
-        t1 = t.time()
+            game_transitions = [self.transitions[i] for i in ends]
 
         if self.verbose:
-            print("finding the game transitions took", t1 - t0, "seconds")
+            print("finding the game transitions took", span["duration"], "seconds")
 
         return game_transitions
 
@@ -214,18 +769,35 @@ class DataCollector:
         :return: batch of frames that could contain the transition
         """
 
+        return self.get_window_images(ending_transition)[0]
+
+    def get_window_images(self, ending_transition):
+        """
+
+        downloads the frames of the window after a game transition along
+        with the segment and frame index of each one
+
+        short segments return fewer frames, so the positions are taken from
+        the frames each segment actually returned rather than a fixed grid
+
+        :param ending_transition: tuple (vod file, frame index)
+        :return: frames, array of segment indices, array of frame indices
+        """
+
         # get the vods to scan
         index = ending_transition[1]
         vods = self.full_vods[index:index + 2 * self.step]
 
-        items = []
+        # download the vods concurrently (map keeps them in order)
+        items = list(self.executor.map(lambda vod: web_scrapper.get_still_frames(self.url + vod,
+                                                                                 self.end_transition_step,
+                                                                                 constants.frames_per_vod),
+                                       vods))
 
-        for vod in vods:
-            items.append(web_scrapper.get_still_frames(self.url + vod,
-                                                       self.end_transition_step,
-                                                       constants.frames_per_vod))
+        segments = np.concatenate([np.full(len(images), index + i) for i, images in enumerate(items)])
+        frames = np.concatenate([np.arange(len(images)) * self.end_transition_step for images in items])
 
-        return np.concatenate(items)
+        return np.concatenate(items), segments, frames
 
     def get_transition_predictions(self):
         """
@@ -237,20 +809,399 @@ class DataCollector:
 
         game_transitions = self.get_game_transitions()
 
-        t0 = t.time()
+        with self.stage("end screen classification") as span:
+
+            if self.streaming:
+                self.stream_transition_predictions(game_transitions)
+            else:
+                # allocate the tensor once and fill it, rather than concatenating
+                # a copy of every window
+                frames_per_vod = len(range(0, constants.frames_per_vod, self.end_transition_step))
+                capacity = frames_per_vod * sum(len(self.full_vods[index:index + 2 * self.step])
+                                                for kind, index in game_transitions)
+
+                self.transition_tensor = np.empty((capacity,) + constants.dimensions + (3,), dtype=np.uint8)
+
+                filled = 0
 
-        tensors = []
+                segments = []
+                frames = []
+                offsets = []
 
-        for transition in game_transitions:
-            tensors.append(self.get_transition_images(transition))
+                for transition in game_transitions:
+                    images, window_segments, window_frames = self.get_window_images(transition)
 
-        self.transition_tensor = np.concatenate(tensors)
-        self.transition_predictions = np.argmax(self.classifier.predict(self.transition_tensor), axis=1)
+                    self.transition_tensor[filled:filled + len(images)] = images
 
-        t1 = t.time()
+                    segments.append(window_segments)
+                    frames.append(window_frames)
+                    offsets.append(filled)
+
+                    filled += len(images)
+
+                # short segments leave the end of the tensor empty
+                self.transition_tensor = self.transition_tensor[:filled]
+
+                self.set_transition_positions(segments, frames, offsets)
+
+                self.transition_predictions = np.argmax(self.predict_probabilities(self.classifier,
+                                                                                   self.transition_tensor),
+                                                        axis=1)
+
+            if self.checkpoint is not None:
+                self.save_transition_checkpoint(game_transitions)
+
+        # each avoided window would have taken as long as the average window
+        if self.smoothing_stats is not None and game_transitions:
+            self.smoothing_stats["download time saved"] = self.smoothing_stats["windows avoided"] * \
+                self.stage_stats["end screen classification"]["time"] / len(game_transitions)
 
         if self.verbose:
-            print("Downloading and classifying the transition images took", t1 - t0, "seconds")
+            print("Downloading and classifying the transition images took", span["duration"], "seconds")
+            print("bytes downloaded:", self.bytes_downloaded(), self.stage_stats)
+            print("peak memory:", frame_buffer.peak_memory(), "bytes")
+
+            if self.smoothing_stats is not None:
+                print("smoothing:", self.smoothing_stats)
+
+            if self.prediction_cache is not None:
+                print(self.prediction_cache)
+
+    def save_transition_checkpoint(self, game_transitions):
+        """
+
+        saves the transition predictions and the end screen frames to the
+        checkpoint once every transition window has been classified
+
+        :param game_transitions: list of game transitions
+        :return: None
+        """
+
+        if self.transition_tensor is not None:
+            end_screen_indices = np.flatnonzero(self.transition_predictions == 4)
+            end_screen_frames = self.transition_tensor[end_screen_indices]
+        else:
+            end_screen_indices = self.end_screen_indices
+            end_screen_frames = self.end_screen_frames
+
+        self.checkpoint.save("transition predictions",
+                             transition_predictions=self.transition_predictions,
+                             end_screen_frames=end_screen_frames,
+                             end_screen_indices=end_screen_indices,
+                             transition_segments=self.transition_segments,
+                             transition_frames=self.transition_frames,
+                             transition_offsets=self.transition_offsets,
+                             windows=len(game_transitions))
+
+    def set_transition_positions(self, segments, frames, offsets):
+        """
+
+        records the segment and frame of every transition prediction and the
+        index of the first prediction of each window
+
+        :param segments: list of arrays of the segment of each frame, one
+                         per window
+        :param frames: list of arrays of the index of each frame within its
+                       segment, one per window
+        :param offsets: index of the first prediction of each window
+        :return: None
+        """
+
+        self.transition_segments = np.concatenate(segments).astype(int) if segments else np.empty(0, dtype=int)
+        self.transition_frames = np.concatenate(frames).astype(int) if frames else np.empty(0, dtype=int)
+        self.transition_offsets = np.array(offsets, dtype=int)
+
+    def stream_transition_predictions(self, game_transitions):
+        """
+
+        classifies the transition windows one at a time, keeping only the
+        frames predicted to be end screens so that memory does not grow with
+        the number of games
+
+        :param game_transitions: list of game transitions
+        :return: None
+        """
+
+        predictions = []
+        segments = []
+        frames = []
+        offsets = []
+
+        end_screen_frames = []
+        end_screen_indices = []
+
+        self.scan_stats = []
+
+        # index of the first frame of the current window in the predictions
+        offset = 0
+
+        # pick up after the last window in the checkpoint
+        windows = 0
+
+        if self.checkpoint is not None and self.checkpoint.manifest["windows"] > 0:
+
+            windows = self.checkpoint.manifest["windows"]
+
+            for arrays in self.checkpoint.get_windows():
+                offsets.append(offset)
+                offset += len(arrays["transition_predictions"])
+
+                predictions.append(arrays["transition_predictions"])
+                segments.append(arrays["transition_segments"])
+                frames.append(arrays["transition_frames"])
+                end_screen_frames.append(arrays["end_screen_frames"])
+                end_screen_indices.append(arrays["end_screen_indices"])
+
+        for window, transition in enumerate(game_transitions[windows:], windows + 1):
+
+            stored = self.get_stored_window(transition)
+
+            if stored is not None:
+                window_segments, window_frames, labels = stored
+
+                # only the end screens are read, from the segment cache
+                over = np.flatnonzero(labels == 4)
+                end_screen_frames.append(self.get_frames(window_segments[over], window_frames[over]))
+            else:
+                if self.early_exit:
+                    images, window_segments, window_frames, labels = self.scan_transition(transition)
+                else:
+                    images, window_segments, window_frames = self.get_window_images(transition)
+                    labels = self.classify_window(window_segments, window_frames, images)
+
+                over = np.flatnonzero(labels == 4)
+                end_screen_frames.append(images[over])
+
+            end_screen_indices.append(over + offset)
+
+            predictions.append(labels)
+            segments.append(window_segments)
+            frames.append(window_frames)
+            offsets.append(offset)
+
+            offset += len(labels)
+
+            if self.checkpoint is not None:
+                self.checkpoint.save_window(window,
+                                            transition_predictions=labels,
+                                            transition_segments=window_segments,
+                                            transition_frames=window_frames,
+                                            end_screen_frames=end_screen_frames[-1],
+                                            end_screen_indices=end_screen_indices[-1])
+
+        if self.early_exit and self.verbose:
+            print("scanned", sum(stats["segments"] for stats in self.scan_stats), "segments and classified",
+                  sum(stats["frames"] for stats in self.scan_stats), "frames, the full windows have",
+                  sum(stats["window segments"] for stats in self.scan_stats), "segments and",
+                  sum(stats["window frames"] for stats in self.scan_stats), "frames")
+
+        self.transition_predictions = np.concatenate(predictions) if predictions else np.empty(0, dtype=int)
+
+        self.set_transition_positions(segments, frames, offsets)
+
+        if end_screen_frames:
+            self.end_screen_frames = np.concatenate(end_screen_frames)
+            self.end_screen_indices = np.concatenate(end_screen_indices)
+        else:
+            self.end_screen_frames = np.empty((0,) + constants.dimensions + (3,), dtype=np.uint8)
+            self.end_screen_indices = np.empty(0, dtype=int)
+
+    def get_window_positions(self, ending_transition):
+        """
+
+        gets the segment and frame of every frame in the window after a
+        game transition
+
+        :param ending_transition: tuple (vod file, frame index)
+        :return: array of segment indices, array of frame indices
+        """
+
+        index = ending_transition[1]
+        segments = np.arange(index, min(index + 2 * self.step, len(self.full_vods)))
+        frames = np.arange(0, constants.frames_per_vod, self.end_transition_step)
+
+        return np.repeat(segments, len(frames)), np.tile(frames, len(segments))
+
+    def classify_window(self, segments, frames, images):
+        """
+
+        classifies frames from a transition window, adding their
+        probabilities to the prediction store
+
+        :param segments: segment of each frame
+        :param frames: index of each frame within its segment
+        :param images: uint8 frames
+        :return: array of labels
+        """
+
+        probabilities = self.predict_probabilities(self.classifier, images)
+
+        if self.store is not None:
+            self.store.append(self.video_id,
+                              self.transition_table,
+                              segments,
+                              frames,
+                              probabilities)
+
+        return np.argmax(probabilities, axis=1)
+
+    def get_stored_window(self, ending_transition):
+        """
+
+        gets the labels of a transition window from the prediction store
+
+        windows with a short segment never have every position of the full
+        grid stored, so they are classified again
+
+        :param ending_transition: tuple (vod file, frame index)
+        :return: array of segment indices, array of frame indices, array of
+                 labels, None if any frame of the window is missing
+        """
+
+        if self.store is None:
+            return None
+
+        segments, frames = self.get_window_positions(ending_transition)
+
+        probabilities, found = self.store.lookup(self.video_id,
+                                                 self.transition_table,
+                                                 segments,
+                                                 frames)
+
+        if not found.all():
+            return None
+
+        return segments, frames, np.argmax(probabilities, axis=1)
+
+    def get_frames(self, segments, frames):
+        """
+
+        downloads (or reads from the segment cache) frames from the segments
+        of the video
+
+        :param segments: index of the segment of each frame in full_vods
+        :param frames: index of each frame within its segment
+        :return: uint8 frames
+        """
+
+        images = list(self.executor.map(lambda segment, frame: web_scrapper.get_still_frame(self.url +
+                                                                                            self.full_vods[segment],
+                                                                                            frame),
+                                        segments,
+                                        frames))
+
+        if not images:
+            return np.empty((0,) + constants.dimensions + (3,), dtype=np.uint8)
+
+        return np.array(images, dtype=np.uint8)
+
+    def scan_transition(self, ending_transition):
+        """
+
+        scans the window after a game transition one segment at a time,
+        stopping once a run of [end_screen_samples] end screens has been
+        followed by a frame that is not an end screen
+
+        only the frames that were scanned are returned, along with their
+        positions, so the window is shorter than a full one
+
+        :param ending_transition: tuple (vod file, frame index)
+        :return: scanned frames, array of segment indices, array of frame
+                 indices, array of labels
+        """
+
+        # get the vods to scan
+        index = ending_transition[1]
+        vods = self.full_vods[index:index + 2 * self.step]
+
+        frames_per_vod = len(range(0, constants.frames_per_vod, self.end_transition_step))
+
+        # keep the next few segments downloading while we classify
+        futures = [self.executor.submit(web_scrapper.get_still_frames,
+                                        self.url + vod,
+                                        self.end_transition_step,
+                                        constants.frames_per_vod)
+                   for vod in vods[:self.workers]]
+
+        images = []
+        labels = []
+        positions = []
+
+        segments = 0
+        classified = 0
+        run = 0
+        found = False
+
+        while futures and not found:
+
+            segment_images = futures.pop(0).result()
+            segments += 1
+
+            # queue up the next segment
+            if segments + len(futures) < len(vods):
+                futures.append(self.executor.submit(web_scrapper.get_still_frames,
+                                                    self.url + vods[segments + len(futures)],
+                                                    self.end_transition_step,
+                                                    constants.frames_per_vod))
+
+            segment_labels = self.classify_window(np.full(len(segment_images), index + segments - 1),
+                                                  np.arange(len(segment_images)) * self.end_transition_step,
+                                                  segment_images)
+            classified += len(segment_labels)
+
+            for frame, (image, label) in enumerate(zip(segment_images, segment_labels)):
+
+                if label != 4 and run >= constants.end_screen_samples:
+                    found = True
+                    break
+
+                run = run + 1 if label == 4 else 0
+
+                images.append(image)
+                labels.append(label)
+                positions.append((index + segments - 1, frame * self.end_transition_step))
+
+        for future in futures:
+            future.cancel()
+
+        self.scan_stats.append({
+            "segments": segments,
+            "frames": classified,
+            "window segments": len(vods),
+            "window frames": len(vods) * frames_per_vod
+        })
+
+        positions = np.array(positions, dtype=int).reshape((-1, 2))
+
+        if images:
+            images = np.array(images)
+        else:
+            images = np.empty((0,) + constants.dimensions + (3,), dtype=np.uint8)
+
+        return images, positions[:, 0], positions[:, 1], np.array(labels, dtype=int)
+
+    def get_transition_frame(self, index):
+        """
+
+        gets a frame from the transition windows
+
+        frames that were not kept (everything but the end screens in
+        streaming mode) are decoded again, usually from the segment cache
+
+        :param index: index of the frame in the transition predictions
+        :return: image
+        """
+
+        if self.transition_tensor is not None:
+            return self.transition_tensor[index]
+
+        position = np.searchsorted(self.end_screen_indices, index)
+
+        if position < len(self.end_screen_indices) and self.end_screen_indices[position] == index:
+            return self.end_screen_frames[position]
+
+        return self.get_frames(self.transition_segments[index:index + 1],
+                               self.transition_frames[index:index + 1])[0]
 
     def save_predictions(self):
         """
@@ -263,16 +1214,19 @@ class DataCollector:
         if self.game_classifier_predictions is None:
             self.get_game_class_batch()
 
-        for i, vod in enumerate(self.vods):
+        for start in range(0, len(self.vods), self.batch_size):
+
+            # download a batch at a time so a long video never holds more
+            # than one batch of images
+            images = self.executor.map(self.get_image, self.vods[start:start + self.batch_size])
 
-            # get the image at the specified index
-            image = self.get_image(vod)
+            for i, image in enumerate(images, start):
 
-            name = constants.label_ids[self.game_classifier_predictions[i]] + "-" + \
-                   self.video_id + "-" + \
-                   str(i * self.step) + ".jpg"
+                name = constants.label_ids[self.game_classifier_predictions[i]] + "-" + \
+                       self.video_id + "-" + \
+                       str(i * self.step) + ".jpg"
 
-            save_img(os.path.join(temp_images, name), image)
+                save_img(os.path.join(temp_images, name), image)
 
     def save_transition_predictions(self, over_only=False):
         """
@@ -286,104 +1240,220 @@ class DataCollector:
         if self.transition_predictions is None:
             self.get_transition_predictions()
 
-        t0 = t.time()
+        with instrumentation.recorder.span("save images") as span:
 
-        game_transitions = self.get_game_transitions()
+            saved = 0
 
-        # number of frames that each transition yields
-        frames_per_transition = int(2 * self.step * constants.frames_per_vod / self.end_transition_step)
+            # go through every frame of the transition windows
+            for index, label in enumerate(self.transition_predictions):
 
-        # go through the game transitions
-        for game_transition_index, (vod_kind, vod_start_index) in enumerate(game_transitions):
+                if not over_only or label == 4:
 
-            # go through all the vods within the next step
-            for i in range(2 * self.step):
+                    image = self.get_transition_frame(index)
+                    name = constants.label_ids[label] + "-" + \
+                           self.video_id + "-" + \
+                           str(self.transition_segments[index]) + "-" + str(self.transition_frames[index]) + ".jpg"
 
-                # go through all the frames in each vod
-                for frame in range(0, constants.frames_per_vod, self.end_transition_step):
+                    save_img(os.path.join(temp_images, name), image)
+                    saved += 1
 
-                    vod_index = vod_start_index + i
+        if self.verbose:
+            print("saving", saved, "images took", span["duration"], "seconds")
 
-                    frame_offset = int((i * constants.frames_per_vod + frame)
-                                       / self.end_transition_step)
+    def get_end_screen_samples(self):
+        """
 
-                    index = game_transition_index * frames_per_transition + frame_offset
+        groups the frames predicted to be end screens into chains (one per
+        game) and takes a random sample from each chain
 
-                    if not over_only or self.transition_predictions[index] == 4:
+        :return: list of samples of frame indices, one for each game
+        """
 
-                        image = self.transition_tensor[index]
-                        name = constants.label_ids[self.transition_predictions[index]] + "-" + \
-                               self.video_id + "-" + \
-                               str(vod_index) + "-" + str(frame) + ".jpg"
+        starts, lengths, labels = transitions.run_length_encode(self.transition_predictions)
 
-                        save_img(os.path.join(temp_images, name), image)
+        # every run of end screens is a chain
+        end_sets = [np.arange(start, start + length)
+                    for start, length, label in zip(starts, lengths, labels)
+                    if label == transitions.label_indices["Over"]]
 
-        t1 = t.time()
+        # windows that end and start on an end screen are still two games
+        if self.transition_offsets is not None:
+            end_sets = [chain
+                        for end_set in end_sets
+                        for chain in np.split(end_set, np.searchsorted(end_set, self.transition_offsets[1:]))
+                        if len(chain) > 0]
 
-        if self.verbose:
-            print("saving", index, "images took", t1 - t0, "seconds")
+        # choose images from each end set (in a random order)
+        samples = [random.sample(end_set.tolist(), min(constants.end_screen_samples,
+                                                       len(end_set)))
+                   for end_set in end_sets]
 
-    def get_winners(self):
+        return samples
+
+    def identify_crewmates(self, items):
         """
 
-        generates a list containing all of the winning colors in
-        a given video
+        identifies the crewmates in a list of end screen frames with a single
+        call to the crewmate identifier
 
-        :return:
+        :param items: indices of the frames in the transition predictions
+        :return: array of color probabilities (frames, crewmates, colors)
         """
 
-        if self.transition_predictions is None:
-            self.get_transition_predictions()
+        frames = np.array([self.get_transition_frame(item) for item in items])
+
+        return winner_vote.identify_crewmates(self.crewmate_identifier, frames)
+
+    def mode_vote(self, samples, identify):
+        """
+
+        identifies every sampled frame and takes the most common color in
+        each crewmate slot
+
+        :param samples: list of samples of frame indices, one for each game
+        :param identify: function mapping frame indices to color probabilities
+        :return: list of winning colors for each game
+        """
 
         winners = []
 
-        t0 = t.time()
+        if not samples:
+            return winners
 
-        # print the transition predictions
+        predictions = np.argmax(identify([item for sample in samples for item in sample]), axis=2)
 
-        end_sets = []
+        # split the predictions back into their end sets
+        splits = np.cumsum([len(sample) for sample in samples])[:-1]
 
-        # get the set of all indices of predictions (games
-        for i in range(len(self.transition_predictions)):
+        for end_set_predictions in np.split(predictions, splits):
+            # get the predictions by taking the mode along the axis
+            winners.append(np.ravel(stats.mode(end_set_predictions, axis=0).mode))
 
-            if self.transition_predictions[i] == 4:
+        self.vote_stats = {
+            "frames": len(predictions),
+            "sampled frames": len(predictions),
+            "predict calls": 1
+        }
 
-                # check to see if this is part of a chain
-                if self.transition_predictions[i - 1] != 4:
-                    # if this is a new chain, add a new list
-                    end_sets.append([i])
-                else:
-                    # otherwise, expand the old chain
-                    end_sets[-1].append(i)
+        return winners
+
+    def weighted_vote(self, samples, identify):
+        """
 
-        # choose images from each end set and process them
-        for end_set in end_sets:
+        sums the log probabilities of the colors in each crewmate slot, one
+        sampled frame per game at a time, and stops sampling a game once the
+        top two colors of every slot are [winner_vote_margin] apart
 
-            # take a random sample
-            sample = random.sample(end_set, min(constants.end_screen_samples,
-                                                len(end_set)))
+        every game that still needs a frame is identified in the same call
 
-            predictions = []
+        :param samples: list of samples of frame indices, one for each game
+        :param identify: function mapping frame indices to color probabilities
+        :return: list of winning colors for each game
+        """
 
-            for item in sample:
-                # convert the vod tensor to PIL
-                image = Image.fromarray(self.transition_tensor[item])
+        log_probabilities = None
+        used = np.zeros(len(samples), dtype=int)
 
-                # crop the images
-                cropped = image.crop(constants.winner_identifier_cropping)
+        active = list(range(len(samples)))
+        calls = 0
 
-                # crop the image into individual crewmates
-                crops = np.array([np.array(item) for item in cropper.crop_crewmates(cropped)])
+        while True:
 
-                predictions.append(np.argmax(self.crewmate_identifier.predict(crops), axis=1))
+            # games that are undecided and still have frames to sample
+            active = [i for i in active if used[i] < len(samples[i])]
 
-            # get the predictions by taking the mode along the axis
-            winners.append(stats.mode(np.array(predictions), axis=0).mode[0])
+            if not active:
+                break
+
+            probabilities = identify([samples[i][used[i]] for i in active])
+            calls += 1
+
+            if log_probabilities is None:
+                log_probabilities = np.zeros((len(samples),) + probabilities.shape[1:])
+
+            log_probabilities[active] += winner_vote.log_probabilities(probabilities[np.newaxis])
+            used[active] += 1
+
+            # margin between the top two colors of the closest slot of each game
+            top_two = np.sort(log_probabilities[active], axis=2)[:, :, -2:]
+            margins = np.min(top_two[:, :, 1] - top_two[:, :, 0], axis=1)
+
+            active = [i for i, margin in zip(active, margins) if margin < constants.winner_vote_margin]
+
+        self.vote_stats = {
+            "frames": int(np.sum(used)),
+            "sampled frames": sum(len(sample) for sample in samples),
+            "predict calls": calls
+        }
+
+        if log_probabilities is None:
+            return []
+
+        return list(np.argmax(log_probabilities, axis=2))
+
+    def compare_voting(self):
+        """
+
+        compares probability-weighted voting against the mode of every
+        sampled frame on the same samples
+
+        every sampled frame is identified once and both votes are computed
+        from the same probabilities
+
+        :return: dictionary of agreement and frames used by each vote
+        """
+
+        if self.transition_predictions is None:
+            self.get_transition_predictions()
+
+        samples = self.get_end_screen_samples()
+
+        items = [item for sample in samples for item in sample]
+        probabilities = dict(zip(items, self.identify_crewmates(items))) if items else {}
+
+        identify = lambda frames: np.array([probabilities[item] for item in frames])
+
+        mode_winners = self.mode_vote(samples, identify)
+        mode_frames = self.vote_stats["frames"]
+
+        weighted_winners = self.weighted_vote(samples, identify)
+        weighted_frames = self.vote_stats["frames"]
+
+        agreement = [np.array_equal(mode, weighted) for mode, weighted in zip(mode_winners, weighted_winners)]
+
+        return {
+            "games": len(samples),
+            "agreement": np.mean(agreement) if agreement else 1.0,
+            "mode frames": mode_frames,
+            "weighted frames": weighted_frames,
+            "frames saved": mode_frames - weighted_frames
+        }
+
+    def get_winners(self):
+        """
+
+        generates a list containing all of the winning colors in
+        a given video
+
+        :return:
+        """
+
+        if self.transition_predictions is None:
+            self.get_transition_predictions()
+
+        with instrumentation.recorder.span("winners") as span:
+
+            samples = self.get_end_screen_samples()
 
-        t1 = t.time()
+            if self.weighted_voting:
+                winners = self.weighted_vote(samples, self.identify_crewmates)
+            else:
+                winners = self.mode_vote(samples, self.identify_crewmates)
 
         if self.verbose:
-            print("identifying the winners took", t1 - t0, "seconds")
+            print("identifying the winners took", span["duration"], "seconds")
+            print(self.vote_stats)
+            print(instrumentation.recorder)
 
         return winners
 
@@ -10,6 +10,15 @@ import random
 from src.Data_Collection import data_collector
 from src import constants
 
+# videos that the tests are run on
+test_vods = [
+    "874833883",
+    "887962963",
+    "887579689",
+    "887571311",
+    "886173458"
+]
+
 
 def collection_parameter_search(limits,
                                 reps):
@@ -27,14 +36,6 @@ def collection_parameter_search(limits,
 
     step_seed_range = step_seed_max - step_seed_min
 
-    vods = [
-        "874833883",
-        "887962963",
-        "887579689",
-        "887571311",
-        "886173458"
-    ]
-
     print("step, end transition step, games found, time elapsed")
 
     for i in range(reps):
@@ -51,7 +52,7 @@ def collection_parameter_search(limits,
         time_elapsed = 0
 
         # go through all of the test games
-        for vod in vods:
+        for vod in test_vods:
 
             t0 = t.time()
 
@@ -75,6 +76,57 @@ def collection_parameter_search(limits,
         print(time_elapsed)
 
 
+def adaptive_step_comparison(vods,
+                             steps):
+    """
+
+    compares fixed step sampling against the adaptive sampler started at
+    the same step
+
+    :param vods: video IDs to test on
+    :param steps: list of steps to compare
+    :return: None
+    """
+
+    print("step, adaptive, probes, games found, time elapsed")
+
+    for step in steps:
+        for adaptive in (False, True):
+
+            # set up accumulators
+            probes = 0
+            games_found = 0
+            time_elapsed = 0
+
+            for vod in vods:
+
+                t0 = t.time()
+
+                if adaptive:
+                    collector = data_collector.DataCollector(vod,
+                                                             adaptive_step=step,
+                                                             verbose=False)
+                else:
+                    collector = data_collector.DataCollector(vod,
+                                                             step=step,
+                                                             verbose=False)
+
+                winners = collector.get_winners()
+
+                t1 = t.time()
+
+                probes += collector.probes
+                games_found += len(winners)
+                time_elapsed += t1 - t0
+
+            # print the results
+            print(step, end=", ")
+            print(adaptive, end=", ")
+            print(probes, end=", ")
+            print(games_found, end=", ")
+            print(time_elapsed)
+
+
 def main():
     """
 
@@ -86,6 +138,9 @@ def main():
     collection_parameter_search((0.05, 0.2, 3, 10),
                                 10)
 
+    adaptive_step_comparison(test_vods,
+                             [2, 4, 8])
+
     # ranges searched
     # 1) 0 - 0.5
     #    1 - 10
@@ -0,0 +1,138 @@
+"""
+
+Author: Arthur Wesley
+
+reusable uint8 frame buffers
+
+"""
+
+import sys
+import resource
+
+import numpy as np
+
+from src import constants
+from src.Data_Collection import instrumentation
+
+
+class FrameRingBuffer:
+
+    def __init__(self, batch_size, dimensions, slots=2):
+        """
+
+        preallocates [slots] uint8 batches of frames that are handed out in
+        turn
+
+        a batch stays valid until the ring comes back around to it, so with
+        two slots one batch can be filled while the last one is in use
+
+        :param batch_size: maximum number of frames in a batch
+        :param dimensions: dimensions of the frames
+        :param slots: number of batches in the ring
+        """
+
+        self.buffers = [np.empty((batch_size,) + dimensions + (3,), dtype=np.uint8)
+                        for i in range(slots)]
+
+        self.slot = 0
+
+    def next(self, size):
+        """
+
+        gets the next batch in the ring
+
+        :param size: number of frames needed (at most batch_size)
+        :return: uint8 array of [size] frames
+        """
+
+        buffer = self.buffers[self.slot]
+        self.slot = (self.slot + 1) % len(self.buffers)
+
+        return buffer[:size]
+
+    def nbytes(self):
+        """
+
+        gets the memory used by the ring
+
+        :return: size of the ring in bytes
+        """
+
+        return sum(buffer.nbytes for buffer in self.buffers)
+
+
+def model_input(tensor):
+    """
+
+    converts a uint8 tensor of frames into the input of a model
+
+    :param tensor: uint8 frames
+    :return: float32 frames
+    """
+
+    return tensor.astype(np.float32)
+
+
+def predict_probabilities(model, tensor, batch_size):
+    """
+
+    runs a model on a uint8 tensor of frames, converting one batch at a
+    time so that only a single batch is ever held as floats
+
+    :param model: model to classify the frames with
+    :param tensor: uint8 frames
+    :param batch_size: number of frames to convert and classify at once
+    :return: array of class probabilities (frames, classes)
+    """
+
+    probabilities = None
+
+    for i in range(0, len(tensor), batch_size):
+
+        with instrumentation.recorder.span("classify", frames=min(batch_size, len(tensor) - i)):
+            batch = model.predict(model_input(tensor[i:i + batch_size]))
+
+        instrumentation.recorder.count("predict calls")
+        instrumentation.recorder.count("frames classified", len(batch))
+
+        if probabilities is None:
+            probabilities = np.empty((len(tensor),) + batch.shape[1:], dtype=np.float32)
+
+        probabilities[i:i + batch_size] = batch
+
+    if probabilities is None:
+        return np.empty((0, len(constants.label_ids)), dtype=np.float32)
+
+    return probabilities
+
+
+def predict_labels(model, tensor, batch_size):
+    """
+
+    classifies a uint8 tensor of frames, converting one batch at a time so
+    that only a single batch is ever held as floats
+
+    :param model: model to classify the frames with
+    :param tensor: uint8 frames
+    :param batch_size: number of frames to convert and classify at once
+    :return: array of labels
+    """
+
+    return np.argmax(predict_probabilities(model, tensor, batch_size), axis=1)
+
+
+def peak_memory():
+    """
+
+    gets the peak resident memory of this process
+
+    :return: peak memory in bytes
+    """
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # linux reports kilobytes, mac reports bytes
+    if sys.platform == "darwin":
+        return peak
+    else:
+        return peak * 1024
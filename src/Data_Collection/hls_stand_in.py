@@ -0,0 +1,251 @@
+"""
+
+Author: Arthur Wesley
+
+local stand-in for a live twitch stream, serving a folder of .ts segments
+as an HLS playlist that grows in real time so live mode can be tested
+offline
+
+"""
+
+import os
+import sys
+import math
+import uuid
+import threading
+import time as t
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from src import constants
+
+
+class HLSStandIn:
+
+    def __init__(self,
+                 segments,
+                 segment_duration=2.0,
+                 window=None,
+                 video=None,
+                 quality=constants.quality(constants.dimensions),
+                 port=0):
+        """
+
+        initializes a stand-in stream, a new segment is published every
+        [segment_duration] seconds once the server has started
+
+        :param segments: list of paths to the .ts files, in order
+        :param segment_duration: seconds between segments
+        :param window: number of segments in a sliding live playlist, None
+                       for an append-only EVENT playlist like the VOD of a
+                       stream in progress
+        :param video: name of the video in the urls (unique to this stream
+                      if None, since segments are cached under their video,
+                      quality and name)
+        :param quality: name of the quality in the urls
+        :param port: port to listen on (0 picks a free port)
+        """
+
+        self.segments = segments
+        self.segment_duration = segment_duration
+        self.window = window
+
+        if video is None:
+            video = "stand-in-" + uuid.uuid4().hex[:8]
+
+        # urls end in /[video]/[quality]/[segment] like twitch's
+        self.path = "/" + video + "/" + quality + "/"
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), self.handler())
+        self.thread = None
+        self.start_time = None
+
+    def handler(self):
+        """
+
+        creates the request handler class for this stream
+
+        :return: request handler class
+        """
+
+        stream = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                stream.respond(self)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        """
+
+        starts serving the stream on a background thread
+
+        :return: url of the media playlist
+        """
+
+        self.start_time = t.time()
+
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+        return self.playlist_url()
+
+    def stop(self):
+        """
+
+        stops serving the stream
+
+        :return: None
+        """
+
+        self.server.shutdown()
+        self.server.server_close()
+
+    def playlist_url(self):
+        """
+
+        gets the url of the media playlist
+
+        :return: url
+        """
+
+        return "http://127.0.0.1:" + str(self.server.server_address[1]) + self.path + "index-dvr.m3u8"
+
+    def published(self):
+        """
+
+        gets the number of segments published so far
+
+        :return: number of segments
+        """
+
+        elapsed = t.time() - self.start_time
+
+        return min(len(self.segments), math.floor(elapsed / self.segment_duration) + 1)
+
+    def playlist(self):
+        """
+
+        writes the media playlist as it stands now
+
+        :return: text of the playlist
+        """
+
+        published = self.published()
+
+        if self.window is None:
+            first = 0
+        else:
+            first = max(0, published - self.window)
+
+        lines = ["#EXTM3U",
+                 "#EXT-X-VERSION:3",
+                 "#EXT-X-TARGETDURATION:" + str(math.ceil(self.segment_duration))]
+
+        if self.window is None:
+            lines.append("#EXT-X-PLAYLIST-TYPE:EVENT")
+
+        lines.append("#EXT-X-MEDIA-SEQUENCE:" + str(first))
+
+        for i in range(first, published):
+            lines.append("#EXTINF:" + str(self.segment_duration) + ",")
+            lines.append(str(i) + ".ts")
+
+        if published == len(self.segments):
+            lines.append("#EXT-X-ENDLIST")
+
+        return "\n".join(lines) + "\n"
+
+    def respond(self, request):
+        """
+
+        answers a request for the playlist (supporting byte ranges) or for
+        a published segment
+
+        :param request: request handler
+        :return: None
+        """
+
+        name = request.path.split("?")[0]
+
+        if not name.startswith(self.path):
+            request.send_error(404)
+            return
+
+        name = name[len(self.path):]
+
+        if name == "index-dvr.m3u8":
+            body = self.playlist().encode()
+            content_type = "application/vnd.apple.mpegurl"
+        elif name.endswith(".ts") and name[:-3].isdigit() and int(name[:-3]) < self.published():
+            with open(self.segments[int(name[:-3])], "rb") as file:
+                body = file.read()
+            content_type = "video/mp2t"
+        else:
+            request.send_error(404)
+            return
+
+        status = 200
+        headers = {}
+
+        byte_range = request.headers.get("Range")
+
+        if byte_range is not None and byte_range.startswith("bytes="):
+
+            start = int(byte_range[len("bytes="):].split("-")[0])
+
+            if start >= len(body):
+                request.send_response(416)
+                request.send_header("Content-Range", "bytes */" + str(len(body)))
+                request.send_header("Content-Length", "0")
+                request.end_headers()
+                return
+
+            headers["Content-Range"] = "bytes " + str(start) + "-" + str(len(body) - 1) + "/" + str(len(body))
+            body = body[start:]
+            status = 206
+
+        request.send_response(status)
+        request.send_header("Content-Type", content_type)
+        request.send_header("Content-Length", str(len(body)))
+
+        for header, value in headers.items():
+            request.send_header(header, value)
+
+        request.end_headers()
+        request.wfile.write(body)
+
+
+def main():
+    """
+
+    serves a folder of numbered .ts segments as a live stream
+
+    usage: hls_stand_in.py [folder] [seconds per segment]
+
+    :return:
+    """
+
+    folder = sys.argv[1]
+    segment_duration = float(sys.argv[2]) if len(sys.argv) > 2 else 2.0
+
+    files = sorted((file for file in os.listdir(folder) if file.endswith(".ts")),
+                   key=lambda file: int("".join(c for c in file if c.isdigit()) or 0))
+
+    stream = HLSStandIn([os.path.join(folder, file) for file in files], segment_duration)
+
+    print("serving", len(files), "segments at", stream.start())
+
+    try:
+        while True:
+            t.sleep(1)
+    except KeyboardInterrupt:
+        stream.stop()
+
+
+if __name__ == "__main__":
+    main()
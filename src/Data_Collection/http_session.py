@@ -0,0 +1,113 @@
+"""
+
+Author: Arthur Wesley
+
+shared connection-pooled HTTP session for metadata and playlist requests
+(segments are downloaded by the asyncio segment downloader)
+
+"""
+
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from src import constants
+
+session = None
+session_lock = threading.Lock()
+
+
+def create_session(pool_size=constants.http_pool_size,
+                   retries=constants.http_retries,
+                   backoff=constants.http_backoff):
+    """
+
+    creates a session that keeps connections alive and retries transient
+    errors with exponential backoff
+
+    :param pool_size: maximum number of connections to keep open per host
+    :param retries: number of times to retry a request
+    :param backoff: backoff factor between retries (seconds)
+    :return: requests session
+    """
+
+    retry = Retry(total=retries,
+                  connect=retries,
+                  read=retries,
+                  status_forcelist=(500, 502, 503, 504),
+                  backoff_factor=backoff)
+
+    adapter = HTTPAdapter(pool_connections=pool_size,
+                          pool_maxsize=pool_size,
+                          max_retries=retry)
+
+    new_session = requests.Session()
+    new_session.mount("http://", adapter)
+    new_session.mount("https://", adapter)
+
+    return new_session
+
+
+def get_session():
+    """
+
+    gets the shared session, creating it on first use
+
+    :return: requests session
+    """
+
+    global session
+
+    with session_lock:
+        if session is None:
+            session = create_session()
+
+    return session
+
+
+def get(url, timeout=constants.http_timeout, **kwargs):
+    """
+
+    sends a GET request through the shared session
+
+    :param url: url to request
+    :param timeout: (connect, read) timeout in seconds
+    :return: response
+    """
+
+    response = get_session().get(url, timeout=timeout, **kwargs)
+    response.raise_for_status()
+
+    return response
+
+
+def connection_stats():
+    """
+
+    counts the requests sent and connections opened by the shared session
+
+    :return: dictionary of requests, connections and reused connections
+    """
+
+    requests_sent = 0
+    connections = 0
+
+    if session is not None:
+
+        for adapter in set(session.adapters.values()):
+
+            pools = adapter.poolmanager.pools
+
+            for key in pools.keys():
+                pool = pools[key]
+
+                requests_sent += pool.num_requests
+                connections += pool.num_connections
+
+    return {
+        "requests": requests_sent,
+        "connections": connections,
+        "reused": requests_sent - connections
+    }
@@ -4,10 +4,10 @@ Author: Arthur Wesley
 
 """
 
-from twitchdl import twitch
 import cv2
 
 from src.Data_Collection import web_scrapper
+from src.Data_Collection import video_metadata
 
 min_frame_step = 20
 
@@ -39,10 +39,10 @@ class ImageGenerator:
 
         self.video_id = video_id
         self.start_index = starting_index
-        access_token = twitch.get_access_token(video_id)
+        metadata = video_metadata.get_metadata(video_id)
 
-        self.base_url = web_scrapper.get_base_url(video_id, access_token)
-        self.vods = web_scrapper.get_vods(video_id, access_token)
+        self.base_url = metadata.get_base_url()
+        self.vods = metadata.get_vods()
 
         self.end_index = len(self.vods)
 
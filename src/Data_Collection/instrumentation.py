@@ -0,0 +1,261 @@
+"""
+
+Author: Arthur Wesley
+
+named timing spans and counters for the collectors, exported as JSON lines
+or as a chrome trace (chrome://tracing or ui.perfetto.dev)
+
+"""
+
+import os
+import json
+import threading
+import time as t
+from contextlib import contextmanager
+
+from src import constants
+
+
+class Recorder:
+
+    def __init__(self, max_events=constants.max_trace_events):
+        """
+
+        initializes an empty recorder
+
+        :param max_events: maximum number of spans and counter samples to
+                           keep, the totals are kept regardless
+        """
+
+        self.max_events = max_events
+
+        self.lock = threading.Lock()
+
+        self.reset()
+
+    def reset(self):
+        """
+
+        forgets every span and counter
+
+        :return: None
+        """
+
+        with self.lock:
+
+            # wall clock time the recorder started and the matching
+            # performance counter, which every event is timed against
+            self.start_time = t.time()
+            self.start = t.perf_counter()
+
+            # spans: dictionaries of name, start, duration, thread and args
+            self.spans = []
+
+            # counter samples: (name, time, total) tuples
+            self.samples = []
+
+            # totals that are kept even once the events are dropped
+            self.span_totals = {}
+            self.counters = {}
+            self.dropped = 0
+
+    @contextmanager
+    def span(self, name, **args):
+        """
+
+        times the block of code inside a with statement
+
+        the span is yielded so that its duration can be read after the block
+
+        :param name: name of the span
+        :param args: extra values stored with the span
+        :return: span dictionary
+        """
+
+        span = {
+            "name": name,
+            "start": t.perf_counter() - self.start,
+            "duration": None,
+            "thread": threading.current_thread().name,
+            "args": args
+        }
+
+        try:
+            yield span
+        finally:
+            span["duration"] = t.perf_counter() - self.start - span["start"]
+
+            with self.lock:
+
+                count, total = self.span_totals.get(name, (0, 0.0))
+                self.span_totals[name] = (count + 1, total + span["duration"])
+
+                if len(self.spans) + len(self.samples) < self.max_events:
+                    self.spans.append(span)
+                else:
+                    self.dropped += 1
+
+    def count(self, name, amount=1):
+        """
+
+        adds to a counter
+
+        :param name: name of the counter
+        :param amount: amount to add
+        :return: None
+        """
+
+        with self.lock:
+
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+            if len(self.spans) + len(self.samples) < self.max_events:
+                self.samples.append((name, t.perf_counter() - self.start, self.counters[name]))
+            else:
+                self.dropped += 1
+
+    def summary(self):
+        """
+
+        gets the number of times each span ran, the total time spent in it
+        and the value of every counter
+
+        :return: dictionary of spans and counters
+        """
+
+        with self.lock:
+
+            return {
+                "spans": {name: {"count": count, "time": total}
+                          for name, (count, total) in self.span_totals.items()},
+                "counters": dict(self.counters),
+                "events dropped": self.dropped
+            }
+
+    def write_json_lines(self, path):
+        """
+
+        writes a line for the run, every span and every counter to a file
+
+        :param path: path to the file
+        :return: None
+        """
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+        summary = self.summary()
+
+        with self.lock:
+            spans = list(self.spans)
+
+        with open(path, "w") as file:
+
+            file.write(json.dumps({"type": "run",
+                                   "pid": os.getpid(),
+                                   "start time": self.start_time,
+                                   "events dropped": summary["events dropped"]}) + "\n")
+
+            for span in spans:
+                file.write(json.dumps(dict(type="span", **span), default=str) + "\n")
+
+            for name, value in summary["counters"].items():
+                file.write(json.dumps({"type": "counter", "name": name, "value": value}) + "\n")
+
+    def chrome_trace(self):
+        """
+
+        converts the spans and counter samples into chrome trace events
+
+        spans from coroutines overlap on the event loop thread without
+        nesting, which the trace viewer cannot draw, so the spans of each
+        thread are split over as many rows as it takes for the spans of
+        every row to nest
+
+        :return: dictionary in the chrome trace format
+        """
+
+        pid = os.getpid()
+
+        with self.lock:
+            spans = sorted(self.spans, key=lambda span: (span["start"], -span["duration"]))
+            samples = list(self.samples)
+
+        events = []
+
+        # thread name -> rows, each row a stack of the end times of the
+        # spans that are open in it
+        rows = {}
+        row_ids = {}
+
+        for span in spans:
+
+            end = span["start"] + span["duration"]
+            thread_rows = rows.setdefault(span["thread"], [])
+
+            for row, stack in enumerate(thread_rows):
+
+                while stack and stack[-1] <= span["start"]:
+                    stack.pop()
+
+                if not stack or stack[-1] >= end:
+                    break
+            else:
+                row = len(thread_rows)
+                thread_rows.append([])
+
+            thread_rows[row].append(end)
+
+            key = (span["thread"], row)
+
+            if key not in row_ids:
+                row_ids[key] = len(row_ids)
+
+                events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": row_ids[key],
+                               "args": {"name": span["thread"] + ("" if row == 0 else " #" + str(row))}})
+
+            events.append({"name": span["name"],
+                           "ph": "X",
+                           "ts": span["start"] * 1e6,
+                           "dur": span["duration"] * 1e6,
+                           "pid": pid,
+                           "tid": row_ids[key],
+                           "args": {name: str(value) for name, value in span["args"].items()}})
+
+        for name, time, total in samples:
+            events.append({"name": name, "ph": "C", "ts": time * 1e6, "pid": pid, "args": {name: total}})
+
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def write_chrome_trace(self, path):
+        """
+
+        writes the chrome trace of the recorder to a file
+
+        :param path: path to the file
+        :return: None
+        """
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+        with open(path, "w") as file:
+            json.dump(self.chrome_trace(), file)
+
+    def __str__(self):
+        """
+
+        formats the totals of the recorder for printing
+
+        :return: string representation of the recorder
+        """
+
+        summary = self.summary()
+
+        lines = [name + ": " + str(span["count"]) + " spans, " + str(span["time"]) + " seconds"
+                 for name, span in summary["spans"].items()]
+        lines += [name + ": " + str(value) for name, value in summary["counters"].items()]
+
+        return "\n".join(lines)
+
+
+# recorder shared by everything in this process
+recorder = Recorder()
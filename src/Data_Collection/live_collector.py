@@ -0,0 +1,319 @@
+"""
+
+Author: Arthur Wesley
+
+follows a stream that is still live, finding the winners of each game as
+soon as its end screen appears
+
+"""
+
+import sys
+import time as t
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from tensorflow.keras import models
+
+from src import constants
+from src.Data_Collection import web_scrapper
+from src.Data_Collection import video_metadata
+from src.Data_Collection import frame_buffer
+from src.Data_Collection import winner_vote
+from src.Data_Collection.live_playlist import LivePlaylist
+from src.Data_Collection.transitions import label_indices
+
+
+class LiveCollector:
+
+    def __init__(self,
+                 video_id=None,
+                 playlist_url=None,
+                 step=1,
+                 end_transition_step=constants.end_transition_step,
+                 poll_interval=constants.live_poll_interval,
+                 workers=constants.download_workers,
+                 batch_size=32,
+                 verbose=True,
+                 classifier=None,
+                 crewmate_identifier=None,
+                 on_winners=None):
+        """
+
+        initializes a live collector for the VOD of a stream in progress (or
+        any HLS media playlist, such as an HLSStandIn)
+
+        :param video_id: ID of the video (ignored if playlist_url is set)
+        :param playlist_url: url of the media playlist to follow
+        :param step: classify one in every [step] segments
+        :param end_transition_step: step between the frames scanned for end
+                                    screens
+        :param poll_interval: seconds between polls of the playlist
+        :param workers: number of segment downloads to keep in flight at once
+        :param batch_size: size of the batches that frames are classified in
+        :param verbose: whether to print each game as it is found
+        :param classifier: game classifier to use (loaded from
+                           constants.game_classifier if None)
+        :param crewmate_identifier: crewmate identifier to use (loaded from
+                                    constants.crewmate_identifier if None)
+        :param on_winners: function called with each game as it is found
+        """
+
+        self.video_id = video_id
+        self.step = step
+        self.end_transition_step = end_transition_step
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.verbose = verbose
+        self.on_winners = on_winners
+
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+
+        # load NNs (unless they were already loaded by the caller)
+        if classifier is None:
+            classifier = models.load_model(constants.game_classifier)
+        if crewmate_identifier is None:
+            crewmate_identifier = models.load_model(constants.crewmate_identifier)
+
+        self.classifier = classifier
+        self.crewmate_identifier = crewmate_identifier
+
+        # the playlist url of a video holds an access token that expires, so
+        # it is read from the (memoized) metadata on every poll
+        if playlist_url is None:
+            self.metadata = video_metadata.get_metadata(video_id)
+            playlist_url = self.metadata.get_playlist_url(constants.quality(constants.dimensions))
+        else:
+            self.metadata = None
+
+        self.playlist = LivePlaylist(playlist_url)
+
+        # sequence number -> (url, time it appeared) of the latest segments
+        self.recent = OrderedDict()
+
+        # state machine: the last segment classified as gameplay or a
+        # meeting while a game is in progress, the end screen being
+        # collected, and whether we are waiting for an end screen that was
+        # already voted on to go away
+        self.in_game = False
+        self.last_game_segment = None
+        self.end_screen = None
+        self.waiting_for_exit = False
+
+        # games found so far
+        self.games = []
+
+        # work done by each poll
+        self.poll_stats = []
+
+    def poll(self):
+        """
+
+        processes the segments appended to the playlist since the last poll
+
+        :return: number of new segments
+        """
+
+        t0 = t.time()
+
+        url = None
+
+        if self.metadata is not None:
+            url = self.metadata.get_playlist_url(constants.quality(constants.dimensions))
+
+        bytes0 = self.playlist.bytes_read
+
+        segments = self.playlist.poll(url)
+
+        for sequence, segment_url in segments:
+            self.recent[sequence] = (segment_url, t0)
+
+        sampled = [(sequence, segment_url) for sequence, segment_url in segments if sequence % self.step == 0]
+
+        if sampled:
+            images = np.array(list(self.executor.map(lambda segment: web_scrapper.get_keyframe(segment[1]),
+                                                     sampled)))
+
+            labels = frame_buffer.predict_labels(self.classifier, images, self.batch_size)
+
+            for (sequence, segment_url), label in zip(sampled, labels):
+                self.update(sequence, label)
+
+        # only the segments a fallback scan could need are kept (the first
+        # poll can hold the whole backlog of the video, so the segments are
+        # only dropped once they have been classified)
+        while len(self.recent) > 4 * self.step + 4:
+            self.recent.popitem(last=False)
+
+        self.poll_stats.append({
+            "new segments": len(segments),
+            "segments classified": len(sampled),
+            "playlist bytes": self.playlist.bytes_read - bytes0,
+            "time": t.time() - t0
+        })
+
+        return len(segments)
+
+    def update(self, sequence, label):
+        """
+
+        advances the state machine by one classified segment
+
+        :param sequence: sequence number of the segment
+        :param label: label of the segment
+        :return: None
+        """
+
+        if label != label_indices["Over"]:
+            self.waiting_for_exit = False
+
+        if self.end_screen is not None:
+
+            if label == label_indices["Over"]:
+                self.scan_end_screen(sequence)
+            else:
+                # the end screen ended before we had enough samples
+                self.finish_game()
+
+        elif label == label_indices["Over"] and not self.waiting_for_exit:
+
+            self.end_screen = {
+                "segment": sequence,
+                "appeared": self.recent[sequence][1],
+                "frames": []
+            }
+
+            self.scan_end_screen(sequence)
+
+        elif label == label_indices["Lobby"] and self.in_game:
+
+            # the game ended without a sampled end screen, so scan the
+            # segments between the last game segment and the lobby
+            self.end_screen = {
+                "segment": self.last_game_segment,
+                "appeared": self.recent[sequence][1],
+                "frames": []
+            }
+
+            for skipped in range(self.last_game_segment, sequence + 1):
+                if skipped in self.recent and self.end_screen is not None:
+                    self.scan_end_screen(skipped)
+
+            if self.end_screen is not None:
+                self.finish_game()
+
+        if label in (label_indices["Gameplay"], label_indices["Meeting"]):
+            self.in_game = True
+            self.last_game_segment = sequence
+
+    def scan_end_screen(self, sequence):
+        """
+
+        keeps the end screen frames of a segment, voting as soon as there
+        are enough of them
+
+        :param sequence: sequence number of the segment
+        :return: None
+        """
+
+        images = web_scrapper.get_still_frames(self.recent[sequence][0],
+                                               self.end_transition_step,
+                                               constants.frames_per_vod)
+
+        labels = frame_buffer.predict_labels(self.classifier, images, self.batch_size)
+
+        self.end_screen["frames"].extend(images[labels == label_indices["Over"]])
+
+        if len(self.end_screen["frames"]) >= constants.end_screen_samples:
+            self.finish_game()
+
+    def finish_game(self):
+        """
+
+        votes on the winners of the end screen that was being collected
+
+        :return: None
+        """
+
+        end_screen = self.end_screen
+        self.end_screen = None
+
+        if not end_screen["frames"]:
+            return
+
+        frames = np.array(end_screen["frames"])
+
+        winners = winner_vote.weighted_winners(winner_vote.identify_crewmates(self.crewmate_identifier, frames))
+
+        game = {
+            "segment": end_screen["segment"],
+            "winners": winners,
+            "frames": len(frames),
+            # seconds from the end screen appearing in the playlist
+            "latency": t.time() - end_screen["appeared"]
+        }
+
+        self.games.append(game)
+
+        self.in_game = False
+        self.waiting_for_exit = True
+
+        if self.verbose:
+            print("game ending at segment", game["segment"], "won by",
+                  [constants.crewmate_color_ids[color] for color in winners],
+                  "found", game["latency"], "seconds after its end screen appeared")
+
+        if self.on_winners is not None:
+            self.on_winners(game)
+
+    def follow(self, max_time=None):
+        """
+
+        polls the playlist until the stream ends
+
+        :param max_time: maximum number of seconds to follow the stream for
+        :return: list of games found
+        """
+
+        t0 = t.time()
+
+        while max_time is None or t.time() - t0 < max_time:
+
+            poll_start = t.time()
+
+            new_segments = self.poll()
+
+            if self.playlist.ended and new_segments == 0:
+                break
+
+            t.sleep(max(0.0, self.poll_interval - (t.time() - poll_start)))
+
+        # the stream ended during an end screen
+        if self.end_screen is not None:
+            self.finish_game()
+
+        if self.verbose:
+            print("followed", self.playlist.next_sequence, "segments over", len(self.poll_stats),
+                  "polls, reading", self.playlist.bytes_read, "bytes of playlist and finding",
+                  len(self.games), "games")
+
+        return self.games
+
+
+def main():
+    """
+
+    follows the VOD of a stream in progress
+
+    usage: live_collector.py [video id]
+
+    :return:
+    """
+
+    collector = LiveCollector(sys.argv[1])
+    collector.follow()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+
+Author: Arthur Wesley
+
+incremental polling of a live HLS media playlist
+
+"""
+
+import re
+
+import requests
+
+from src.Data_Collection import http_session
+
+
+class LivePlaylist:
+
+    def __init__(self, url):
+        """
+
+        initializes a live playlist, nothing is fetched until it is polled
+
+        :param url: url of the media playlist
+        """
+
+        self.url = url
+        self.base_url = re.sub("/[^/]+$", "/", url.split("?")[0])
+
+        # sequence number of the next segment that has not been seen
+        self.next_sequence = 0
+
+        # append-only playlists (EVENT and VOD) are read from where the last
+        # poll stopped, so only the new lines are downloaded and parsed
+        self.append_only = False
+        self.offset = 0
+        self.partial_line = ""
+
+        self.target_duration = None
+        self.ended = False
+
+        # counters
+        self.polls = 0
+        self.bytes_read = 0
+
+    def poll(self, url=None):
+        """
+
+        fetches the segments appended to the playlist since the last poll
+
+        :param url: new url of the playlist (such as after the access token
+                    was refreshed), None to keep the current one
+        :return: list of (sequence number, segment url) pairs
+        """
+
+        if url is not None:
+            self.url = url
+
+        self.polls += 1
+
+        if self.append_only:
+
+            try:
+                response = http_session.get(self.url, headers={"Range": "bytes=" + str(self.offset) + "-"})
+            except requests.HTTPError as e:
+                # nothing has been appended since the last poll
+                if e.response is not None and e.response.status_code == 416:
+                    return []
+                raise
+
+            # the playlist was only appended to, so parse the new lines
+            if response.status_code == 206 and self.continues_playlist(response):
+                self.bytes_read += len(response.content)
+                self.offset += len(response.content)
+
+                return self.parse(response.text, full=False)
+
+            # the server ignored the range or the playlist was rewritten
+            self.bytes_read += len(response.content)
+            self.offset = len(response.content)
+            self.partial_line = ""
+
+            return self.parse(response.text, full=True)
+
+        response = http_session.get(self.url)
+
+        self.bytes_read += len(response.content)
+        self.offset = len(response.content)
+
+        return self.parse(response.text, full=True)
+
+    def continues_playlist(self, response):
+        """
+
+        checks that a ranged response continues the playlist that was
+        already read, rather than a playlist that was rewritten and is now
+        shorter than the old offset
+
+        :param response: response to a ranged request
+        :return: whether the response starts at the old offset
+        """
+
+        content_range = response.headers.get("Content-Range", "")
+        match = re.match(r"bytes (\d+)-\d+/(\d+|\*)", content_range)
+
+        return match is not None and int(match.group(1)) == self.offset
+
+    def parse(self, text, full):
+        """
+
+        parses playlist lines, keeping the segments that have not been seen
+
+        :param text: text of the playlist (or of the lines appended to it)
+        :param full: whether the text is the whole playlist
+        :return: list of (sequence number, segment url) pairs
+        """
+
+        if full:
+            # a full playlist numbers its segments from its media sequence
+            sequence = 0
+        else:
+            text = self.partial_line + text
+            sequence = self.next_sequence
+
+        lines = text.split("\n")
+
+        # the last line may still be being written
+        self.partial_line = lines.pop()
+
+        segments = []
+
+        for line in lines:
+
+            line = line.strip()
+
+            if line.startswith("#EXT-X-MEDIA-SEQUENCE:"):
+                sequence = int(line.split(":")[1])
+            elif line.startswith("#EXT-X-TARGETDURATION:"):
+                self.target_duration = float(line.split(":")[1])
+            elif line.startswith("#EXT-X-PLAYLIST-TYPE:"):
+                self.append_only = line.split(":")[1] in ("EVENT", "VOD")
+            elif line == "#EXT-X-ENDLIST":
+                self.ended = True
+            elif line and not line.startswith("#"):
+
+                if sequence >= self.next_sequence:
+                    segments.append((sequence, line if "://" in line else self.base_url + line))
+
+                sequence += 1
+
+        self.next_sequence = max(self.next_sequence, sequence)
+
+        if self.partial_line.strip() == "#EXT-X-ENDLIST":
+            self.ended = True
+
+        return segments
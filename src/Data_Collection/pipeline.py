@@ -0,0 +1,286 @@
+"""
+
+Author: Arthur Wesley
+
+producer/consumer pipeline that overlaps downloading frames with
+classifying them
+
+"""
+
+import queue
+import threading
+import time as t
+
+import numpy as np
+
+from src import constants
+from src.Data_Collection.frame_buffer import FrameRingBuffer
+
+
+class PipelineStats:
+
+    def __init__(self):
+        """
+
+        initializes an empty set of pipeline statistics
+
+        """
+
+        # time the downloaders spent blocked because the queue was full
+        self.download_stall = 0
+        # time the inference stage spent blocked because the queue was empty
+        self.inference_stall = 0
+
+        # time spent actually downloading and classifying
+        self.download_time = 0
+        self.inference_time = 0
+
+        # queue depth sampled every time the inference stage takes a frame
+        self.queue_depth_samples = 0
+        self.queue_depth_total = 0
+        self.max_queue_depth = 0
+
+        self.wall_time = 0
+
+        self.lock = threading.Lock()
+
+    def sample_queue_depth(self, depth):
+        """
+
+        records the depth of the frame queue
+
+        :param depth: current number of frames in the queue
+        :return: None
+        """
+
+        self.queue_depth_samples += 1
+        self.queue_depth_total += depth
+        self.max_queue_depth = max(self.max_queue_depth, depth)
+
+    def mean_queue_depth(self):
+        """
+
+        gets the mean depth of the frame queue
+
+        :return: mean queue depth
+        """
+
+        if self.queue_depth_samples == 0:
+            return 0
+
+        return self.queue_depth_total / self.queue_depth_samples
+
+    def bottleneck(self):
+        """
+
+        gets the stage that the pipeline was waiting on
+
+        if the inference stage stalls more than the downloaders the
+        pipeline is download bound, otherwise it is inference bound
+
+        :return: "download" or "inference"
+        """
+
+        if self.inference_stall > self.download_stall:
+            return "download"
+        else:
+            return "inference"
+
+    def __str__(self):
+        """
+
+        formats the statistics for printing
+
+        :return: string representation of the statistics
+        """
+
+        return "wall time: " + str(self.wall_time) + "\n" + \
+               "download time: " + str(self.download_time) + \
+               " (stalled " + str(self.download_stall) + ")\n" + \
+               "inference time: " + str(self.inference_time) + \
+               " (stalled " + str(self.inference_stall) + ")\n" + \
+               "queue depth: mean " + str(self.mean_queue_depth()) + \
+               ", max " + str(self.max_queue_depth) + "\n" + \
+               "bottleneck: " + self.bottleneck()
+
+
+class DownloadPipeline:
+
+    def __init__(self,
+                 fetch,
+                 items,
+                 executor,
+                 workers,
+                 queue_depth):
+        """
+
+        initializes a download pipeline
+
+        :param fetch: function that downloads and decodes one item into a frame
+        :param items: list of items to fetch
+        :param executor: thread pool to run the downloaders on
+        :param workers: number of downloaders to run
+        :param queue_depth: maximum number of decoded frames waiting for inference
+        """
+
+        self.fetch = fetch
+        self.items = items
+        self.executor = executor
+        self.workers = workers
+
+        # indices of the items that still need to be downloaded
+        self.work = queue.Queue()
+
+        for index in range(len(items)):
+            self.work.put(index)
+
+        # bounded queue of (index, frame) pairs waiting for inference
+        self.frames = queue.Queue(maxsize=queue_depth)
+
+        self.stats = PipelineStats()
+
+        # set when the inference stage fails so the downloaders stop
+        self.cancelled = False
+
+    def put(self, item):
+        """
+
+        puts an item into the frame queue, blocking while it is full
+
+        :param item: (index, frame) pair
+        :return: None
+        """
+
+        while not self.cancelled:
+            try:
+                self.frames.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def produce(self):
+        """
+
+        downloader stage: fetches items until there is no work left
+
+        :return: None
+        """
+
+        while not self.cancelled:
+
+            try:
+                index = self.work.get_nowait()
+            except queue.Empty:
+                return
+
+            t0 = t.time()
+
+            try:
+                frame = self.fetch(self.items[index])
+            except Exception as e:
+                # hand the error to the inference stage so that it is raised
+                frame = e
+
+            t1 = t.time()
+
+            self.put((index, frame))
+
+            t2 = t.time()
+
+            with self.stats.lock:
+                self.stats.download_time += t1 - t0
+                self.stats.download_stall += t2 - t1
+
+    def run(self, predict, batch_size, dimensions=constants.dimensions, on_batch=None):
+        """
+
+        runs the pipeline, classifying frames in chunks of batch_size as
+        they arrive
+
+        :param predict: function mapping a tensor of frames to an array of
+                        labels (or of rows of probabilities)
+        :param batch_size: number of frames to classify at once
+        :param dimensions: dimensions of the frames
+        :param on_batch: function called with the item indices and labels of
+                         each chunk once it has been classified (optional)
+        :return: array of predictions, in the same order as the items
+        """
+
+        t0 = t.time()
+
+        for i in range(self.workers):
+            self.executor.submit(self.produce)
+
+        try:
+            predictions = self.consume(predict, batch_size, dimensions, on_batch)
+        finally:
+            # stop the downloaders if the inference stage failed
+            self.cancelled = True
+
+        self.stats.wall_time = t.time() - t0
+
+        return predictions
+
+    def consume(self, predict, batch_size, dimensions, on_batch=None):
+        """
+
+        inference stage: drains the frame queue in chunks of batch_size
+
+        :param predict: function mapping a tensor of frames to an array of
+                        labels (or of rows of probabilities)
+        :param batch_size: number of frames to classify at once
+        :param dimensions: dimensions of the frames
+        :param on_batch: function called with the item indices and labels of
+                         each chunk once it has been classified (optional)
+        :return: array of predictions, in the same order as the items
+        """
+
+        # allocated once the shape of the predictions is known
+        predictions = np.empty(len(self.items))
+
+        # the chunks are reused uint8 buffers, converted only at the model
+        buffer = FrameRingBuffer(batch_size, dimensions)
+
+        remaining = len(self.items)
+
+        while remaining > 0:
+
+            chunk_size = min(batch_size, remaining)
+
+            tensor = buffer.next(chunk_size)
+            indices = np.empty(chunk_size, dtype=int)
+
+            # fill the chunk from the queue
+            for i in range(chunk_size):
+
+                t1 = t.time()
+                index, frame = self.frames.get()
+                t2 = t.time()
+
+                self.stats.inference_stall += t2 - t1
+                self.stats.sample_queue_depth(self.frames.qsize())
+
+                if isinstance(frame, Exception):
+                    raise frame
+
+                tensor[i] = frame
+                indices[i] = index
+
+            t1 = t.time()
+
+            # classify the chunk and put the labels back in item order
+            chunk = predict(tensor)
+
+            if predictions.shape[1:] != chunk.shape[1:]:
+                predictions = np.empty((len(self.items),) + chunk.shape[1:], dtype=chunk.dtype)
+
+            predictions[indices] = chunk
+
+            self.stats.inference_time += t.time() - t1
+
+            if on_batch is not None:
+                on_batch(indices, predictions[indices])
+
+            remaining -= chunk_size
+
+        return predictions
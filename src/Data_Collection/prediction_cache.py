@@ -0,0 +1,217 @@
+"""
+
+Author: Arthur Wesley
+
+in-memory cache of classifier predictions keyed by a perceptual hash of
+each frame
+
+"""
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from src import constants
+from src.Data_Collection import frame_buffer
+
+# size of the thumbnail that frames are hashed from
+hash_dimensions = (8, 8)
+
+# number of levels that the brightness of a frame is split into
+brightness_buckets = 16
+
+
+def thumbnails(tensor):
+    """
+
+    shrinks every frame of a uint8 tensor to a grayscale thumbnail one
+    column wider than hash_dimensions by averaging blocks of pixels
+
+    :param tensor: uint8 frames (frames, height, width, 3)
+    :return: array of thumbnails (frames, rows, columns + 1) in [0, 255]
+    """
+
+    rows, columns = hash_dimensions
+
+    # every other pixel is plenty for an 8x9 thumbnail
+    gray = np.mean(tensor[:, ::2, ::2], axis=3, dtype=np.float32)
+
+    row_edges = np.linspace(0, gray.shape[1], rows + 1).astype(int)[:-1]
+    column_edges = np.linspace(0, gray.shape[2], columns + 2).astype(int)[:-1]
+
+    thumbnail = np.add.reduceat(np.add.reduceat(gray, row_edges, axis=1), column_edges, axis=2)
+
+    # the blocks differ in size by at most a pixel, so normalize them
+    thumbnail /= np.outer(np.diff(np.append(row_edges, gray.shape[1])),
+                          np.diff(np.append(column_edges, gray.shape[2])))
+
+    return thumbnail
+
+
+def difference_hash(thumbnail):
+    """
+
+    computes the difference hash of every thumbnail
+
+    each bit of the hash says whether a pixel is brighter than the one to
+    its left, so frames that only differ by noise or compression usually
+    hash the same
+
+    :param thumbnail: array of thumbnails from thumbnails()
+    :return: array of 64 bit hashes
+    """
+
+    bits = thumbnail[:, :, 1:] > thumbnail[:, :, :-1]
+
+    return np.packbits(bits.reshape(len(thumbnail), -1), axis=1).view(">u8").ravel()
+
+
+def frame_keys(tensor):
+    """
+
+    gets the keys that the predictions of a tensor of frames are cached
+    under
+
+    the difference hash ignores brightness, so a flat black frame and a flat
+    white frame would hash the same. The key also holds the brightness of the
+    frame in [brightness_buckets] steps, along with the resolution of the
+    frame since frames of different resolutions go through different models
+
+    :param tensor: uint8 frames (frames, height, width, 3)
+    :return: list of keys
+    """
+
+    thumbnail = thumbnails(tensor)
+
+    brightness = (np.mean(thumbnail, axis=(1, 2)) * brightness_buckets / 256).astype(int)
+
+    return [(tensor.shape[1:3], frame_hash, bucket)
+            for frame_hash, bucket in zip(difference_hash(thumbnail).tolist(), brightness.tolist())]
+
+
+class PredictionCache:
+
+    def __init__(self, max_entries=constants.prediction_cache_entries):
+        """
+
+        initializes an empty prediction cache
+
+        :param max_entries: maximum number of hashes to remember
+        """
+
+        self.max_entries = max_entries
+
+        # (resolution, hash, brightness) -> probabilities, least recently
+        # used first
+        self.entries = OrderedDict()
+
+        # counters
+        self.hits = 0
+        self.misses = 0
+        self.predict_calls = 0
+        self.predict_calls_saved = 0
+
+        self.lock = threading.Lock()
+
+    def predict(self, model, tensor, batch_size):
+        """
+
+        classifies a uint8 tensor of frames, only running the model on the
+        frames whose hash has not been seen recently
+
+        :param model: model to classify the frames with
+        :param tensor: uint8 frames
+        :param batch_size: number of frames to classify at once
+        :return: array of class probabilities (frames, classes)
+        """
+
+        if len(tensor) == 0:
+            return frame_buffer.predict_probabilities(model, tensor, batch_size)
+
+        keys = frame_keys(tensor)
+
+        probabilities = [None] * len(keys)
+
+        # key -> positions of the frames with that key that are not cached,
+        # so that repeats within the tensor are only classified once
+        misses = OrderedDict()
+
+        with self.lock:
+            for i, key in enumerate(keys):
+                if key in self.entries:
+                    self.entries.move_to_end(key)
+                    probabilities[i] = self.entries[key]
+                else:
+                    misses.setdefault(key, []).append(i)
+
+        if misses:
+            predictions = frame_buffer.predict_probabilities(model,
+                                                             tensor[[positions[0] for positions in misses.values()]],
+                                                             batch_size)
+        else:
+            predictions = []
+
+        with self.lock:
+
+            for (key, positions), prediction in zip(misses.items(), predictions):
+                for i in positions:
+                    probabilities[i] = prediction
+
+                self.entries[key] = prediction
+                self.entries.move_to_end(key)
+
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+            self.hits += len(keys) - len(misses)
+            self.misses += len(misses)
+
+            calls = -(-len(misses) // batch_size)
+            self.predict_calls += calls
+            self.predict_calls_saved += -(-len(keys) // batch_size) - calls
+
+        return np.array(probabilities, dtype=np.float32)
+
+    def hit_rate(self):
+        """
+
+        gets the fraction of frames whose prediction came from the cache
+
+        :return: hit rate
+        """
+
+        total = self.hits + self.misses
+
+        if total == 0:
+            return 0
+
+        return self.hits / total
+
+    def stats(self):
+        """
+
+        gets the counters of the cache
+
+        :return: dictionary of counters
+        """
+
+        return {
+            "frames": self.hits + self.misses,
+            "hits": self.hits,
+            "hit rate": self.hit_rate(),
+            "frames classified": self.misses,
+            "predict calls": self.predict_calls,
+            "predict calls saved": self.predict_calls_saved
+        }
+
+    def __str__(self):
+        """
+
+        formats the counters of the cache for printing
+
+        :return: string representation of the cache
+        """
+
+        return "prediction cache: " + str(self.hits) + " hits, " + str(self.misses) + " misses (" + \
+               str(self.hit_rate()) + " hit rate), " + str(self.predict_calls_saved) + " predict calls saved"
@@ -0,0 +1,380 @@
+"""
+
+Author: Arthur Wesley
+
+persistent columnar store of classifier predictions
+
+"""
+
+import os
+import hashlib
+import threading
+
+import numpy as np
+
+from src import constants
+
+# dtype of each column of a table
+columns = {
+    "segment": np.int32,
+    "frame": np.int32,
+    "probabilities": np.float32
+}
+
+# number of bits of a key used by the frame
+frame_bits = 20
+
+
+def keys(segments, frames):
+    """
+
+    combines segment and frame indices into a single key that sorts by
+    segment and then by frame
+
+    :param segments: array of segment indices
+    :param frames: array of frame indices within the segments
+    :return: array of keys
+    """
+
+    return (np.asarray(segments, dtype=np.int64) << frame_bits) | np.asarray(frames, dtype=np.int64)
+
+
+def model_identity(model):
+    """
+
+    hashes the weights of a model, so that the predictions of a retrained
+    classifier go into their own table rather than being mixed with (or
+    served from) the predictions of the old one
+
+    :param model: model to identify
+    :return: hex digest
+    """
+
+    digest = hashlib.sha1()
+
+    for weights in model.get_weights():
+        digest.update(np.ascontiguousarray(weights).tobytes())
+
+    return digest.hexdigest()[:12]
+
+
+def table_name(resolution, model):
+    """
+
+    gets the name of the table holding the predictions of a classifier
+
+    :param resolution: resolution the classifier runs at
+    :param model: classifier
+    :return: name of the table
+    """
+
+    return constants.quality(resolution) + "-" + model_identity(model)
+
+
+class PredictionStore:
+
+    def __init__(self, directory, classes=len(constants.label_ids)):
+        """
+
+        initializes a prediction store
+
+        each video has a directory holding one table per kind of prediction
+        (the resolution and the weights of the classifier), and each table keeps
+        its segment, frame and probability columns in separate append-only
+        binary files
+
+        :param directory: directory to store the predictions in
+        :param classes: number of probabilities in each prediction
+        """
+
+        self.directory = directory
+        self.classes = classes
+
+        self.lock = threading.Lock()
+
+        # (video ID, table) -> sorted keys of the table, the latest row each
+        # key is stored in and the number of rows that have been indexed
+        self.indexes = {}
+
+    def column_path(self, video_id, table, column):
+        """
+
+        gets the path of the file that a column is stored in
+
+        :param video_id: ID of the video
+        :param table: name of the table
+        :param column: name of the column
+        :return: path to the column
+        """
+
+        return os.path.join(self.directory, video_id, table, column + ".bin")
+
+    def append(self, video_id, table, segments, frames, probabilities):
+        """
+
+        appends predictions to a table
+
+        the probabilities are written first and the segments last, and a
+        table is only read up to its shortest column, so a crash part way
+        through an append never leaves a row without its probabilities. Any
+        rows left over from such a crash are cut off before appending
+
+        :param video_id: ID of the video
+        :param table: name of the table
+        :param segments: array of segment indices
+        :param frames: array of frame indices within the segments
+        :param probabilities: array of class probabilities (rows, classes)
+        :return: None
+        """
+
+        data = {
+            "probabilities": np.asarray(probabilities, dtype=columns["probabilities"]).reshape(-1, self.classes),
+            "frame": np.asarray(frames, dtype=columns["frame"]),
+            "segment": np.asarray(segments, dtype=columns["segment"])
+        }
+
+        with self.lock:
+
+            os.makedirs(os.path.join(self.directory, video_id, table), exist_ok=True)
+
+            self.truncate(video_id, table)
+
+            for column, values in data.items():
+                with open(self.column_path(video_id, table, column), "ab") as file:
+                    file.write(values.tobytes())
+
+    def row_size(self, column):
+        """
+
+        gets the number of bytes each row takes up in a column
+
+        :param column: name of the column
+        :return: number of bytes
+        """
+
+        size = np.dtype(columns[column]).itemsize
+
+        if column == "probabilities":
+            size *= self.classes
+
+        return size
+
+    def rows(self, video_id, table):
+        """
+
+        gets the number of complete rows in a table
+
+        :param video_id: ID of the video
+        :param table: name of the table
+        :return: number of rows
+        """
+
+        paths = {column: self.column_path(video_id, table, column) for column in columns}
+
+        if not all(os.path.exists(path) for path in paths.values()):
+            return 0
+
+        return min(os.path.getsize(path) // self.row_size(column) for column, path in paths.items())
+
+    def truncate(self, video_id, table):
+        """
+
+        cuts every column of a table down to the rows that all of the
+        columns have
+
+        :param video_id: ID of the video
+        :param table: name of the table
+        :return: None
+        """
+
+        paths = {column: self.column_path(video_id, table, column) for column in columns}
+
+        if not all(os.path.exists(path) for path in paths.values()):
+            return
+
+        rows = self.rows(video_id, table)
+
+        for column, path in paths.items():
+            if os.path.getsize(path) != rows * self.row_size(column):
+                os.truncate(path, rows * self.row_size(column))
+
+    def read(self, video_id, table):
+        """
+
+        reads every row of a table, in the order they were appended
+
+        :param video_id: ID of the video
+        :param table: name of the table
+        :return: arrays of segments, frames and probabilities
+        """
+
+        with self.lock:
+
+            if not os.path.exists(self.column_path(video_id, table, "segment")):
+                return (np.empty(0, dtype=columns["segment"]),
+                        np.empty(0, dtype=columns["frame"]),
+                        np.empty((0, self.classes), dtype=columns["probabilities"]))
+
+            segments = np.fromfile(self.column_path(video_id, table, "segment"), dtype=columns["segment"])
+            frames = np.fromfile(self.column_path(video_id, table, "frame"), dtype=columns["frame"])
+            probabilities = np.fromfile(self.column_path(video_id, table, "probabilities"),
+                                        dtype=columns["probabilities"])
+
+        probabilities = probabilities[:len(probabilities) // self.classes * self.classes].reshape(-1, self.classes)
+
+        rows = min(len(segments), len(frames), len(probabilities))
+
+        return segments[:rows], frames[:rows], probabilities[:rows]
+
+    def index(self, video_id, table):
+        """
+
+        gets the sorted keys of a table and the latest row that each key is
+        stored in
+
+        the index is kept between calls and only the rows appended since the
+        last call (by this process or any other) are read and merged into it
+
+        :param video_id: ID of the video
+        :param table: name of the table
+        :return: array of sorted keys, array of rows
+        """
+
+        with self.lock:
+
+            rows = self.rows(video_id, table)
+
+            sorted_keys, key_rows, indexed = self.indexes.get((video_id, table),
+                                                              (np.empty(0, dtype=np.int64),
+                                                               np.empty(0, dtype=np.int64),
+                                                               0))
+
+            # the table was deleted, so start again
+            if rows < indexed:
+                sorted_keys, key_rows, indexed = np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), 0
+
+            if rows > indexed:
+
+                segments = np.fromfile(self.column_path(video_id, table, "segment"),
+                                       dtype=columns["segment"],
+                                       count=rows - indexed,
+                                       offset=indexed * self.row_size("segment"))
+                frames = np.fromfile(self.column_path(video_id, table, "frame"),
+                                     dtype=columns["frame"],
+                                     count=rows - indexed,
+                                     offset=indexed * self.row_size("frame"))
+
+                new_keys = keys(segments, frames)
+                new_rows = np.arange(indexed, rows, dtype=np.int64)
+
+                # sort the new rows by key, newest first, and keep the newest
+                # row of each key
+                order = np.lexsort((-new_rows, new_keys))
+                new_keys = new_keys[order]
+                new_rows = new_rows[order]
+
+                newest = np.concatenate(([True], new_keys[1:] != new_keys[:-1]))
+                new_keys = new_keys[newest]
+                new_rows = new_rows[newest]
+
+                # keys that were already indexed point at their new row, and
+                # the rest are inserted in order
+                positions = np.searchsorted(sorted_keys, new_keys)
+
+                existing = positions < len(sorted_keys)
+                existing[existing] = sorted_keys[positions[existing]] == new_keys[existing]
+
+                key_rows = key_rows.copy()
+                key_rows[positions[existing]] = new_rows[existing]
+
+                sorted_keys = np.insert(sorted_keys, positions[~existing], new_keys[~existing])
+                key_rows = np.insert(key_rows, positions[~existing], new_rows[~existing])
+
+                self.indexes[(video_id, table)] = (sorted_keys, key_rows, rows)
+
+        return sorted_keys, key_rows
+
+    def query(self, video_id, table, first_segment=0, last_segment=None):
+        """
+
+        gets the predictions of a range of segments, sorted by segment and
+        frame
+
+        a frame that was appended more than once keeps its latest prediction.
+        The range is found by searching the index of the table, and only its
+        rows are read from the probabilities
+
+        :param video_id: ID of the video
+        :param table: name of the table
+        :param first_segment: first segment of the range
+        :param last_segment: segment after the end of the range (None for
+                             every segment after first_segment)
+        :return: arrays of segments, frames and probabilities
+        """
+
+        sorted_keys, key_rows = self.index(video_id, table)
+
+        start = np.searchsorted(sorted_keys, keys(first_segment, 0))
+
+        if last_segment is None:
+            end = len(sorted_keys)
+        else:
+            end = np.searchsorted(sorted_keys, keys(last_segment, 0))
+
+        if end <= start:
+            return (np.empty(0, dtype=columns["segment"]),
+                    np.empty(0, dtype=columns["frame"]),
+                    np.empty((0, self.classes), dtype=columns["probabilities"]))
+
+        range_keys = sorted_keys[start:end]
+        rows = key_rows[start:end]
+
+        # every row in the index has been written, so the probabilities go
+        # at least as far as the largest row
+        probabilities = np.memmap(self.column_path(video_id, table, "probabilities"),
+                                  dtype=columns["probabilities"],
+                                  mode="r",
+                                  shape=(np.max(rows) + 1, self.classes))
+
+        return ((range_keys >> frame_bits).astype(columns["segment"]),
+                (range_keys & ((1 << frame_bits) - 1)).astype(columns["frame"]),
+                np.array(probabilities[rows]))
+
+    def lookup(self, video_id, table, segments, frames):
+        """
+
+        gets the predictions of specific frames
+
+        :param video_id: ID of the video
+        :param table: name of the table
+        :param segments: array of segment indices
+        :param frames: array of frame indices within the segments
+        :return: array of probabilities (NaN for frames that are not stored),
+                 boolean array of the frames that were found
+        """
+
+        segments = np.asarray(segments)
+        frames = np.asarray(frames)
+
+        probabilities = np.full((len(segments), self.classes), np.nan, dtype=columns["probabilities"])
+
+        if len(segments) == 0:
+            return probabilities, np.zeros(0, dtype=bool)
+
+        stored_segments, stored_frames, stored_probabilities = self.query(video_id,
+                                                                          table,
+                                                                          np.min(segments),
+                                                                          np.max(segments) + 1)
+
+        if len(stored_segments) == 0:
+            return probabilities, np.zeros(len(segments), dtype=bool)
+
+        stored_keys = keys(stored_segments, stored_frames)
+        requested_keys = keys(segments, frames)
+
+        positions = np.minimum(np.searchsorted(stored_keys, requested_keys), len(stored_keys) - 1)
+
+        found = stored_keys[positions] == requested_keys
+        probabilities[found] = stored_probabilities[positions[found]]
+
+        return probabilities, found
@@ -6,13 +6,13 @@ Author: Arthur Wesley
 
 import os
 
-from twitchdl import twitch
 from twitchdl.exceptions import ConsoleError
 
 import cv2
 
 from src import constants
 from src.Data_Collection import web_scrapper
+from src.Data_Collection import video_metadata
 
 
 def find_video_id_index(file_name):
@@ -102,14 +102,12 @@ def update_resolution(input_dir,
 
                 previous_video = video_id
 
-                # update the access token
-                access_token = twitch.get_access_token(video_id)
-                vods = web_scrapper.get_vods(video_id, access_token)
+                # the token and playlists are only fetched once per video
+                metadata = video_metadata.get_metadata(video_id)
+                vods = metadata.get_vods()
 
                 # get the url
-                url = web_scrapper.get_base_url(video_id,
-                                                access_token,
-                                                constants.quality(new_resolution))
+                url = metadata.get_base_url(constants.quality(new_resolution))
         except TypeError:
             continue
         except ConsoleError:
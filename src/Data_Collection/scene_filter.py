@@ -0,0 +1,143 @@
+"""
+
+Author: Arthur Wesley
+
+scene-change detection over the sampled frames of a video, used to only
+classify the frames where the game state could have changed
+
+"""
+
+import numpy as np
+
+from src import constants
+from src.Data_Collection.prediction_cache import thumbnails
+
+
+def color_histograms(tensor, bins=constants.scene_histogram_bins):
+    """
+
+    computes a normalized histogram of each color channel of every frame
+
+    :param tensor: uint8 frames (frames, height, width, 3)
+    :param bins: number of bins per channel
+    :return: array of histograms (frames, 3 * bins)
+    """
+
+    frames = len(tensor)
+
+    # every fourth pixel is plenty for a histogram
+    pixels = tensor[:, ::4, ::4].reshape(frames, -1, 3)
+
+    # bin of every pixel, offset by its channel and its frame so that a
+    # single bincount fills every histogram at once
+    bin_index = pixels.astype(np.int64) * bins // 256
+    bin_index += np.arange(3) * bins
+    bin_index += (np.arange(frames) * 3 * bins)[:, np.newaxis, np.newaxis]
+
+    counts = np.bincount(bin_index.ravel(), minlength=frames * 3 * bins).reshape(frames, 3 * bins)
+
+    return (counts / pixels.shape[1]).astype(np.float32)
+
+
+def scene_features(tensor):
+    """
+
+    computes the features that scene changes are detected from: the color
+    histograms and the grayscale thumbnail of every frame
+
+    :param tensor: uint8 frames (frames, height, width, 3)
+    :return: array of features (frames, features)
+    """
+
+    return np.concatenate([color_histograms(tensor),
+                           thumbnails(tensor).reshape(len(tensor), -1) / 255], axis=1).astype(np.float32)
+
+
+def scene_changes(features,
+                  histogram_threshold=constants.scene_histogram_threshold,
+                  difference_threshold=constants.scene_difference_threshold):
+    """
+
+    finds the frames that look sharply different from the frame before them
+
+    :param features: array of features from scene_features
+    :param histogram_threshold: fraction of the pixels of a channel that have
+                                to change color bin to count as a change
+    :param difference_threshold: mean brightness change of the thumbnail (as a
+                                 fraction of the full range) that counts as a
+                                 change
+    :return: array of the indices of the frames that start a new scene
+    """
+
+    histogram_size = 3 * constants.scene_histogram_bins
+
+    histograms = features[:, :histogram_size]
+    thumbnail = features[:, histogram_size:]
+
+    # total variation distance between the histograms of a channel,
+    # averaged over the channels
+    histogram_distance = np.sum(np.abs(np.diff(histograms, axis=0)), axis=1) / 6
+    difference = np.mean(np.abs(np.diff(thumbnail, axis=0)), axis=1)
+
+    changed = (histogram_distance > histogram_threshold) | (difference > difference_threshold)
+
+    return np.flatnonzero(changed) + 1
+
+
+def select_frames(length, changes, keep_alive=constants.scene_keep_alive):
+    """
+
+    chooses the frames to classify: the first frame, every scene change and
+    every [keep_alive] frames in case a change was missed
+
+    :param length: number of frames
+    :param changes: indices of the scene changes
+    :param keep_alive: step between frames that are classified regardless
+    :return: sorted array of frame indices
+    """
+
+    if length == 0:
+        return np.empty(0, dtype=int)
+
+    return np.union1d(np.union1d([0], changes), np.arange(0, length, keep_alive)).astype(int)
+
+
+def inherit(length, selected):
+    """
+
+    maps every frame to the selected frame at or before it, whose label it
+    takes
+
+    :param length: number of frames
+    :param selected: sorted array of selected frame indices (including 0)
+    :return: array of positions in selected, one per frame
+    """
+
+    return np.searchsorted(selected, np.arange(length), side="right") - 1
+
+
+def evaluate(changes, labels):
+    """
+
+    measures the detected scene changes against the transitions of a full
+    classification
+
+    :param changes: indices of the detected scene changes
+    :param labels: label of every frame from classifying all of them
+    :return: dictionary of precision and recall
+    """
+
+    labels = np.asarray(labels)
+
+    transitions = np.flatnonzero(labels[1:] != labels[:-1]) + 1
+    found = np.intersect1d(changes, transitions)
+
+    return {
+        "scene changes": len(changes),
+        "transitions": len(transitions),
+        "transitions found": len(found),
+        # a scene change that is not a transition only costs a classification
+        "precision": len(found) / len(changes) if len(changes) else 1.0,
+        # a transition that is not a scene change is only found by a keep-alive
+        "recall": len(found) / len(transitions) if len(transitions) else 1.0
+    }
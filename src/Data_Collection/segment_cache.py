@@ -0,0 +1,256 @@
+"""
+
+Author: Arthur Wesley
+
+persistent on-disk cache of downloaded .ts segments
+
+"""
+
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+
+from src import constants
+
+
+class SegmentCache:
+
+    def __init__(self, directory, max_bytes, sync_bytes=constants.segment_cache_sync_bytes):
+        """
+
+        initializes a segment cache, picking up any segments already in
+        the directory
+
+        the directory may be shared by several processes (such as the
+        workers of a batch collector), so the files on disk are the truth:
+        lookups read the file whether or not this process wrote it, and the
+        directory is scanned again before evicting and after every
+        [sync_bytes] bytes written, so that the byte budget covers the
+        segments of every process
+
+        :param directory: directory to store the segments in
+        :param max_bytes: maximum number of bytes to keep in the cache
+        :param sync_bytes: number of bytes this process writes between scans
+        """
+
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.sync_bytes = sync_bytes
+
+        # file name -> size in bytes, least recently used first, as of the
+        # last scan plus the segments this process used since
+        self.entries = OrderedDict()
+        self.size = 0
+
+        # bytes written since the last scan
+        self.unsynced = 0
+
+        # counters
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.scans = 0
+
+        self.lock = threading.Lock()
+
+        self.scan()
+
+    def scan(self):
+        """
+
+        rebuilds the entries from the segments in the directory (must be
+        called while holding the lock, or before the cache is shared)
+
+        :return: None
+        """
+
+        self.entries = OrderedDict()
+        self.size = 0
+        self.unsynced = 0
+        self.scans += 1
+
+        if not os.path.isdir(self.directory):
+            return
+
+        files = []
+
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".ts"):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    # evicted by another process during the scan
+                    continue
+
+                files.append((stat.st_mtime, entry.name, stat.st_size))
+
+        # the modification time of each file is its last use
+        files.sort()
+
+        for mtime, name, size in files:
+            self.entries[name] = size
+            self.size += size
+
+    @staticmethod
+    def file_name(video, quality, segment):
+        """
+
+        gets the name of the file that a segment is stored in
+
+        :param video: video the segment belongs to
+        :param quality: quality of the segment
+        :param segment: name of the segment
+        :return: file name
+        """
+
+        key = "/".join([video, quality, segment])
+
+        return hashlib.sha1(key.encode()).hexdigest() + ".ts"
+
+    def get(self, video, quality, segment):
+        """
+
+        gets a segment from the cache
+
+        :param video: video the segment belongs to
+        :param quality: quality of the segment
+        :param segment: name of the segment
+        :return: bytes of the segment, None if it is not cached
+        """
+
+        name = self.file_name(video, quality, segment)
+        path = os.path.join(self.directory, name)
+
+        try:
+            with open(path, "rb") as file:
+                data = file.read()
+
+            os.utime(path)
+
+        except FileNotFoundError:
+            # the segment was never cached or was evicted (possibly by
+            # another process)
+            with self.lock:
+                self.misses += 1
+
+                if name in self.entries:
+                    self.size -= self.entries.pop(name)
+
+            return None
+
+        with self.lock:
+            self.hits += 1
+
+            # mark the segment as the most recently used
+            if name not in self.entries:
+                self.size += len(data)
+
+            self.entries[name] = len(data)
+            self.entries.move_to_end(name)
+
+        return data
+
+    def put(self, video, quality, segment, data):
+        """
+
+        adds a segment to the cache, evicting the least recently used
+        segments to stay under the byte budget
+
+        :param video: video the segment belongs to
+        :param quality: quality of the segment
+        :param segment: name of the segment
+        :param data: bytes of the segment
+        :return: None
+        """
+
+        if len(data) > self.max_bytes:
+            return
+
+        name = self.file_name(video, quality, segment)
+        path = os.path.join(self.directory, name)
+
+        os.makedirs(self.directory, exist_ok=True)
+
+        # write to a temporary file first so a crash never leaves half a segment
+        temp_path = path + "." + str(threading.get_ident()) + ".tmp"
+
+        with open(temp_path, "wb") as file:
+            file.write(data)
+
+        os.replace(temp_path, path)
+
+        with self.lock:
+
+            if name in self.entries:
+                self.size -= self.entries[name]
+
+            self.entries[name] = len(data)
+            self.entries.move_to_end(name)
+            self.size += len(data)
+            self.unsynced += len(data)
+
+            # other processes may have written segments since the last scan
+            if self.size > self.max_bytes or self.unsynced >= self.sync_bytes:
+                self.scan()
+
+            self.evict()
+
+    def evict(self):
+        """
+
+        removes the least recently used segments until the cache is within
+        its byte budget (must be called while holding the lock)
+
+        once over budget the cache is evicted down to [sync_bytes] below it
+        (at most a tenth of the budget), so that a full cache is not scanned
+        again on every write. Two processes evicting at once can remove a
+        few more segments than needed, which only costs downloading them
+        again
+
+        :return: None
+        """
+
+        if self.size <= self.max_bytes:
+            return
+
+        target = self.max_bytes - min(self.sync_bytes, self.max_bytes // 10)
+
+        while self.size > target and self.entries:
+
+            name, size = self.entries.popitem(last=False)
+            self.size -= size
+            self.evictions += 1
+
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+
+    def hit_rate(self):
+        """
+
+        gets the fraction of lookups that were served from the cache
+
+        :return: hit rate
+        """
+
+        lookups = self.hits + self.misses
+
+        if lookups == 0:
+            return 0
+
+        return self.hits / lookups
+
+    def __str__(self):
+        """
+
+        formats the cache statistics for printing
+
+        :return: string representation of the cache
+        """
+
+        return "segment cache: " + str(len(self.entries)) + " segments, " + \
+               str(self.size) + " / " + str(self.max_bytes) + " bytes, " + \
+               str(self.hits) + " hits, " + str(self.misses) + " misses, " + \
+               str(self.evictions) + " evictions, " + str(self.scans) + " scans"
@@ -0,0 +1,244 @@
+"""
+
+Author: Arthur Wesley
+
+decodes frames from .ts segments that have already been downloaded into
+memory
+
+"""
+
+import io
+import threading
+
+import av
+import numpy as np
+
+
+def open_segment(data):
+    """
+
+    opens a segment held in memory
+
+    :param data: bytes of the segment
+    :return: container, video stream
+    """
+
+    container = av.open(io.BytesIO(data))
+
+    return container, container.streams.video[0]
+
+
+def frame_index(stream, pts):
+    """
+
+    converts a presentation timestamp into a frame index within the segment
+
+    :param stream: video stream the timestamp belongs to
+    :param pts: presentation timestamp
+    :return: index of the frame
+    """
+
+    fps = stream.average_rate or stream.guessed_rate
+
+    return int(round((pts - stream.start_time) * stream.time_base * fps))
+
+
+def demux(data):
+    """
+
+    reads the packets of a segment without decoding them
+
+    :param data: bytes of the segment
+    :return: video stream, list of packets in decode order
+    """
+
+    container, stream = open_segment(data)
+
+    # the last packet of the stream is an empty flush packet
+    packets = [packet for packet in container.demux(stream) if packet.size > 0]
+
+    return stream, packets
+
+
+def count_frames(data):
+    """
+
+    counts the number of frames in a segment
+
+    :param data: bytes of the segment
+    :return: number of frames in the segment
+    """
+
+    return len(demux(data)[1])
+
+
+def decode_frame(data, index=0, seek=True, grab=True):
+    """
+
+    decodes a single frame from a segment
+
+    in seek mode decoding starts at the last keyframe before the index,
+    otherwise it starts at the first frame. In grab mode only the target
+    frame is converted to RGB, otherwise every decoded frame is
+
+    :param data: bytes of the segment
+    :param index: index of the frame
+    :param seek: whether to start decoding at the keyframe before the index
+    :param grab: whether to skip converting the frames before the index
+    :return: image, number of frames decoded
+    """
+
+    stream, packets = demux(data)
+
+    start = 0
+
+    if seek:
+        # find the last keyframe at or before the index
+        for i, packet in enumerate(packets):
+            if packet.is_keyframe and frame_index(stream, packet.pts) <= index:
+                start = i
+
+    decoded = 0
+
+    for packet in packets[start:] + [None]:
+        for frame in stream.codec_context.decode(packet):
+
+            decoded += 1
+
+            image = None
+
+            if not grab:
+                image = frame.to_ndarray(format="rgb24")
+
+            if frame_index(stream, frame.pts) >= index:
+
+                if image is None:
+                    image = frame.to_ndarray(format="rgb24")
+
+                return image, decoded
+
+    raise IndexError("index out of bounds " + str(index) + " for a segment of " +
+                     str(len(packets)) + " frames")
+
+
+def decode_frames(data, step=50, frames=300):
+    """
+
+    decodes every [step] frames from a segment
+
+    short segments are read up to their last frame
+
+    :param data: bytes of the segment
+    :param step: number of steps between frames
+    :param frames: maximum number of frames to read (usually 300)
+    :return: tensor of still frames, number of frames decoded
+    """
+
+    container, stream = open_segment(data)
+
+    images = []
+    decoded = 0
+
+    for frame in container.decode(stream):
+
+        index = frame_index(stream, frame.pts)
+
+        if index >= frames:
+            break
+
+        decoded += 1
+
+        if index % step == 0:
+            images.append(frame.to_ndarray(format="rgb24"))
+
+    return np.array(images), decoded
+
+
+class KeyframeDecoder:
+
+    def __init__(self):
+        """
+
+        initializes a keyframe decoder, the codec is created from the first
+        segment that it decodes and reused for every segment after that
+
+        """
+
+        self.codec = None
+
+    def get_codec(self, stream):
+        """
+
+        gets a decoder for the specified stream, reusing the existing one
+        when the codec has not changed
+
+        :param stream: video stream to decode
+        :return: codec context
+        """
+
+        if self.codec is None or self.codec.name != stream.codec_context.name:
+            self.codec = av.CodecContext.create(stream.codec_context.name, "r")
+
+        return self.codec
+
+    def decode(self, data):
+        """
+
+        decodes the first keyframe of a segment without decoding any of
+        the frames after it
+
+        :param data: bytes of the segment
+        :return: image
+        """
+
+        # twitch segments are always mpeg-ts, so skip probing the format
+        container = av.open(io.BytesIO(data), format="mpegts")
+        stream = container.streams.video[0]
+
+        codec = self.get_codec(stream)
+
+        keyframe_pts = None
+
+        try:
+            for packet in container.demux(stream):
+
+                if keyframe_pts is None:
+
+                    if not packet.is_keyframe or packet.size == 0:
+                        continue
+
+                    keyframe_pts = packet.pts
+
+                # the decoder may hold frames back to reorder them, so keep
+                # feeding it packets until the keyframe comes out
+                for frame in codec.decode(packet if packet.size > 0 else None):
+                    if frame.pts == keyframe_pts:
+                        return frame.to_ndarray(format="rgb24")
+
+        finally:
+            # drop any frames still held by the decoder before the next segment
+            codec.flush_buffers()
+            container.close()
+
+        raise IndexError("segment has no keyframe")
+
+
+# one keyframe decoder per decoding thread, since a codec context can only
+# decode one segment at a time
+keyframe_decoders = threading.local()
+
+
+def decode_keyframe(data):
+    """
+
+    decodes the first keyframe of a segment with this thread's keyframe
+    decoder
+
+    :param data: bytes of the segment
+    :return: image
+    """
+
+    if not hasattr(keyframe_decoders, "decoder"):
+        keyframe_decoders.decoder = KeyframeDecoder()
+
+    return keyframe_decoders.decoder.decode(data)
@@ -0,0 +1,171 @@
+"""
+
+Author: Arthur Wesley
+
+hidden markov model smoothing of game classifier predictions
+
+"""
+
+import numpy as np
+
+from src import constants
+
+
+def transition_matrix(stay_probabilities=constants.smoothing_stay_probabilities):
+    """
+
+    creates a transition matrix where each state keeps itself with its own
+    probability and is equally likely to change to any other state
+
+    :param stay_probabilities: dictionary of label -> probability of
+                               staying in that state
+    :return: transition matrix (from, to)
+    """
+
+    stay = np.array([stay_probabilities[constants.label_ids[i]] for i in range(len(constants.label_ids))])
+
+    matrix = np.repeat(((1 - stay) / (len(stay) - 1))[:, np.newaxis], len(stay), axis=1)
+    np.fill_diagonal(matrix, stay)
+
+    return matrix
+
+
+def learn_transition_matrix(sequences, states=len(constants.label_ids), pseudocount=1):
+    """
+
+    estimates a transition matrix by counting the transitions in sequences
+    of labels (such as hand checked predictions)
+
+    :param sequences: list of arrays of labels
+    :param states: number of states
+    :param pseudocount: count added to every transition so none is impossible
+    :return: transition matrix (from, to)
+    """
+
+    counts = np.full((states, states), pseudocount, dtype=float)
+
+    for sequence in sequences:
+        sequence = np.asarray(sequence)
+        np.add.at(counts, (sequence[:-1], sequence[1:]), 1)
+
+    return counts / np.sum(counts, axis=1, keepdims=True)
+
+
+def max_plus(a, b):
+    """
+
+    multiplies stacks of matrices in the max-plus semiring, where addition
+    is max and multiplication is +
+
+    :param a: array of matrices (..., n, k)
+    :param b: array of matrices (..., k, m)
+    :return: array of matrices (..., n, m)
+    """
+
+    # loop over the shared dimension rather than broadcasting all of it at
+    # once, which keeps the temporaries the size of the result
+    product = a[..., :, 0, np.newaxis] + b[..., np.newaxis, 0, :]
+
+    for i in range(1, a.shape[-1]):
+        np.maximum(product, a[..., :, i, np.newaxis] + b[..., np.newaxis, i, :], out=product)
+
+    return product
+
+
+def prefix_scan(matrices):
+    """
+
+    computes every prefix max-plus product of a sequence of matrices with
+    log2(n) vectorized steps (Hillis-Steele)
+
+    :param matrices: array of matrices (n, k, k)
+    :return: array of products, element t being matrices[0] x ... x matrices[t]
+    """
+
+    products = matrices.copy()
+    n = len(products)
+
+    distance = 1
+
+    while distance < n:
+        products[distance:] = max_plus(products[:n - distance], products[distance:])
+        distance *= 2
+
+    return products
+
+
+def follow_pointers(pointers):
+    """
+
+    follows backpointers from the last frame to the first with log2(n)
+    vectorized steps (pointer jumping)
+
+    :param pointers: array (frames, states), element [t, j] being the state
+                     at frame t - 1 on the best path to state j at frame t
+    :return: array (frames, states), element [t, j] being the state at
+             frame t on the best path ending in state j at the last frame
+    """
+
+    frames, states = pointers.shape
+
+    # each row maps a state at frame min(t + span, frames - 1) to frame t
+    jumps = np.empty_like(pointers)
+    jumps[:-1] = pointers[1:]
+    jumps[-1] = np.arange(states)
+
+    distance = 1
+
+    while distance < frames:
+        jumps[:frames - distance] = np.take_along_axis(jumps[:frames - distance], jumps[distance:], axis=1)
+        distance *= 2
+
+    return jumps
+
+
+def viterbi(probabilities, transitions, initial=None):
+    """
+
+    finds the most likely sequence of states given the softmax outputs of
+    the classifier for each frame
+
+    every frame is decoded at once: the best score of a path ending in each
+    state is computed with a max-plus prefix scan, and the backpointers are
+    followed by pointer jumping, so there is no python loop over the frames
+
+    frames without probabilities (rows of NaN) give no evidence and are
+    decided by their neighbours
+
+    :param probabilities: array of class probabilities (frames, states)
+    :param transitions: transition matrix (from, to)
+    :param initial: probability of starting in each state (uniform if None)
+    :return: array of states
+    """
+
+    probabilities = np.asarray(probabilities, dtype=float)
+    frames, states = probabilities.shape
+
+    if frames == 0:
+        return np.empty(0, dtype=int)
+
+    if initial is None:
+        initial = np.full(states, 1 / states)
+
+    emissions = np.log(np.maximum(probabilities, constants.epsilon))
+    emissions[np.isnan(emissions)] = 0
+
+    log_transitions = np.log(transitions)
+
+    # step t moves from the state at t - 1 to the state at t
+    steps = log_transitions[np.newaxis, :, :] + emissions[:, np.newaxis, :]
+
+    # the first step starts every row from the initial distribution so that
+    # each row of a product is the forward score
+    steps[0] = np.log(initial) + emissions[0]
+
+    forward = prefix_scan(steps)[:, 0, :]
+
+    # best previous state for each state of every frame after the first
+    pointers = np.zeros((frames, states), dtype=int)
+    pointers[1:] = np.argmax(forward[:-1, :, np.newaxis] + log_transitions, axis=1)
+
+    return follow_pointers(pointers)[:, np.argmax(forward[-1])]
@@ -0,0 +1,56 @@
+"""
+
+Author: Arthur Wesley
+
+run-length encoding of game classifier predictions
+
+"""
+
+import numpy as np
+
+from src import constants
+
+# label id of each kind of image
+label_indices = {label: index for index, label in constants.label_ids.items()}
+
+# kinds of images that can come right before the lobby at the end of a game
+game_labels = [label_indices["Gameplay"], label_indices["Meeting"], label_indices["Over"]]
+
+
+def run_length_encode(predictions):
+    """
+
+    splits an array of predictions into runs of identical predictions
+
+    :param predictions: array of labels
+    :return: arrays of the start, length and label of each run
+    """
+
+    predictions = np.asarray(predictions)
+
+    if len(predictions) == 0:
+        return np.empty(0, dtype=int), np.empty(0, dtype=int), predictions.astype(int)
+
+    # a run starts at 0 and wherever the label changes (never wrapping around)
+    starts = np.concatenate(([0], np.flatnonzero(predictions[1:] != predictions[:-1]) + 1))
+    lengths = np.diff(np.append(starts, len(predictions)))
+    labels = predictions[starts].astype(int)
+
+    return starts, lengths, labels
+
+
+def game_end_runs(labels):
+    """
+
+    finds the runs that end a game: runs of gameplay, meetings or end
+    screens that are followed by a lobby
+
+    :param labels: label of each run
+    :return: indices of the runs that end a game
+    """
+
+    labels = np.asarray(labels)
+
+    ends = (labels[1:] == label_indices["Lobby"]) & np.isin(labels[:-1], game_labels)
+
+    return np.flatnonzero(ends)
@@ -0,0 +1,180 @@
+"""
+
+Author: Arthur Wesley
+
+memoized access tokens and playlists for twitch videos
+
+"""
+
+import re
+import time as t
+
+import m3u8
+from twitchdl import twitch
+from twitchdl.commands import _parse_playlists, _get_playlist_by_name, _get_vod_paths
+
+from src import constants
+from src.Data_Collection import http_session
+
+
+class VideoMetadata:
+
+    def __init__(self, video_id, access_token=None, ttl=constants.metadata_ttl):
+        """
+
+        initializes the metadata of a video, nothing is fetched until it is
+        first needed
+
+        :param video_id: ID of the video
+        :param access_token: access token for the video (fetched if None)
+        :param ttl: number of seconds before fetched data is fetched again
+        """
+
+        self.video_id = video_id
+        self.ttl = ttl
+
+        # access token and master playlist, fetched together
+        self.access_token = access_token
+        self.playlists = None
+        self.playlists_time = None
+
+        # quality -> (media playlist, time it was fetched)
+        self.media_playlists = {}
+
+    def expired(self, fetch_time):
+        """
+
+        checks whether data fetched at the specified time has expired
+
+        :param fetch_time: time the data was fetched
+        :return: whether the data needs to be fetched again
+        """
+
+        return fetch_time is None or t.time() - fetch_time > self.ttl
+
+    def get_access_token(self):
+        """
+
+        gets the access token for the video
+
+        :return: access token
+        """
+
+        if self.access_token is None or self.expired(self.playlists_time):
+            self.refresh()
+
+        return self.access_token
+
+    def refresh(self):
+        """
+
+        fetches a new access token and master playlist
+
+        a token passed to the constructor is used for the first fetch
+
+        :return: None
+        """
+
+        if self.access_token is None or self.playlists_time is not None:
+            self.access_token = twitch.get_access_token(self.video_id)
+
+        playlists_m3u8 = twitch.get_playlists(self.video_id, self.access_token)
+
+        self.playlists = list(_parse_playlists(playlists_m3u8))
+        self.playlists_time = t.time()
+
+    def get_playlists(self):
+        """
+
+        gets the variants listed in the master playlist
+
+        :return: list of (name, resolution, url) tuples
+        """
+
+        if self.playlists is None or self.expired(self.playlists_time):
+            self.refresh()
+
+        return self.playlists
+
+    def get_qualities(self):
+        """
+
+        gets the names of the qualities the video is available in
+
+        :return: list of quality names
+        """
+
+        return [name for name, resolution, url in self.get_playlists()]
+
+    def get_playlist_url(self, quality):
+        """
+
+        gets the url of the media playlist of the specified quality
+
+        :param quality: quality of the video
+        :return: url of the media playlist
+        """
+
+        return _get_playlist_by_name(self.get_playlists(), quality)
+
+    def get_base_url(self, quality=constants.quality(constants.res_360p)):
+        """
+
+        gets the url that the segments of the specified quality are relative to
+
+        :param quality: quality of the video
+        :return: base url
+        """
+
+        return re.sub("/[^/]+$", "/", self.get_playlist_url(quality))
+
+    def get_media_playlist(self, quality=constants.quality(constants.dimensions)):
+        """
+
+        gets the media playlist of the specified quality
+
+        :param quality: quality of the video
+        :return: m3u8 playlist
+        """
+
+        playlist, fetch_time = self.media_playlists.get(quality, (None, None))
+
+        if playlist is None or self.expired(fetch_time):
+
+            response = http_session.get(self.get_playlist_url(quality))
+
+            playlist = m3u8.loads(response.text)
+            self.media_playlists[quality] = (playlist, t.time())
+
+        return playlist
+
+    def get_vods(self, quality=constants.quality(constants.dimensions)):
+        """
+
+        gets the list of segments in the video
+
+        :param quality: quality of the video
+        :return: list of segment names
+        """
+
+        return _get_vod_paths(self.get_media_playlist(quality), None, None)
+
+
+# video ID -> VideoMetadata
+metadata_cache = {}
+
+
+def get_metadata(video_id, access_token=None):
+    """
+
+    gets the memoized metadata for a video
+
+    :param video_id: ID of the video
+    :param access_token: access token to use if the video has not been seen yet
+    :return: VideoMetadata object
+    """
+
+    if video_id not in metadata_cache:
+        metadata_cache[video_id] = VideoMetadata(video_id, access_token)
+
+    return metadata_cache[video_id]
@@ -6,18 +6,18 @@ https://github.com/ihabunek/twitch-dl/blob/master/twitchdl/download.py
 
 """
 
-import m3u8
-import requests
-import re
-
 import cv2
-import numpy as np
-from twitchdl import twitch
-from twitchdl import download
 
 from src import constants
+from src.Data_Collection import async_downloader
+from src.Data_Collection import segment_decoder
+from src.Data_Collection import video_metadata
+from src.Data_Collection import instrumentation
+from src.Data_Collection.segment_cache import SegmentCache
 
-from twitchdl.commands import _parse_playlists, _get_playlist_by_name, _get_vod_paths
+# cache that every segment download goes through (set to None to disable)
+segment_cache = SegmentCache(constants.segment_cache_directory,
+                             constants.segment_cache_bytes)
 
 
 def get_base_url(video_id,
@@ -33,42 +33,39 @@ def get_base_url(video_id,
     :return: generated URL
     """
 
-    if access_token is None:
-        access_token = twitch.get_access_token(video_id)
-
-    playlists_m3u8 = twitch.get_playlists(video_id, access_token)
-    playlists = list(_parse_playlists(playlists_m3u8))
-    playlist_url = _get_playlist_by_name(playlists, quality)
-
-    return re.sub("/[^/]+$", "/", playlist_url)
+    return video_metadata.get_metadata(video_id, access_token).get_base_url(quality)
 
 
-def get_vods(video_id, access_token=None):
+def get_vods(video_id,
+             access_token=None,
+             quality=constants.quality(constants.dimensions)):
     """
 
     generates a list of all the vods for the video
 
     :param access_token: access token for the video
     :param video_id: ID of the video
+    :param quality: quality of the video
     :return: list of vods the video has
     """
 
-    start = None
-    end = None
+    return video_metadata.get_metadata(video_id, access_token).get_vods(quality)
+
 
-    if access_token is None:
-        access_token = twitch.get_access_token(video_id)
+def get_segment(url):
+    """
+
+    downloads a segment into memory
 
-    playlists_m3u8 = twitch.get_playlists(video_id, access_token)
-    playlists = list(_parse_playlists(playlists_m3u8))
-    playlist_uri = _get_playlist_by_name(playlists,
-                                         constants.quality(constants.dimensions))
+    every frame of the segment is decoded from the returned bytes, so
+    each segment only needs to be downloaded once. Segments are read from
+    the segment cache when they have been downloaded before
 
-    response = requests.get(playlist_uri)
-    response.raise_for_status()
-    playlist = m3u8.loads(response.text)
+    :param url: url of the segment
+    :return: bytes of the segment
+    """
 
-    return _get_vod_paths(playlist, start, end)
+    return async_downloader.get_downloader().get_segments([url], segment_cache)[0]
 
 
 def count_frames(url):
@@ -80,16 +77,7 @@ def count_frames(url):
     :return: number of frames in that image
     """
 
-    vidObj = cv2.VideoCapture(url)
-
-    success = True
-    frames = 0
-
-    while success:
-        success, image = vidObj.read()
-        frames += 1
-
-    return frames - 1
+    return segment_decoder.count_frames(get_segment(url))
 
 
 def get_video(url):
@@ -97,49 +85,62 @@ def get_video(url):
 
     gets the video from a url
 
-    https://docs.opencv.org/master/d8/dfe/classcv_1_1VideoCapture.html#ac4107fb146a762454a8a87715d9b7c96
-
     :param url: url the video is at
     :return: size of the video in bytes
     """
 
-    response = requests.get(url, stream=True, timeout=download.CONNECT_TIMEOUT)
-
-    size = 0
-
-    with open("test.ts", "wb+") as target:
-
-        for chunk in response.iter_content(chunk_size=download.CHUNK_SIZE):
-            target.write(chunk)
-            size += len(chunk)
+    return len(get_segment(url))
 
-    return size
 
-
-def get_still_frame(url, index=0):
+def get_still_frame(url, index=0, seek=True, grab=True, return_decoded=False):
     """
 
     get a still frame from a video url
 
+    the segment is downloaded once by the segment downloader and decoded
+    from memory. In seek mode decoding starts at the keyframe before the
+    index and in grab mode only the target frame is converted to RGB
+
     :param index: index of the still frame
     :param url: URL to the video
-    :return: image
+    :param seek: whether to start decoding at the keyframe before the index
+    :param grab: whether to skip converting the frames before the index
+    :param return_decoded: whether to also return the number of frames decoded
+    :return: image (and the number of frames decoded if return_decoded)
     """
 
-    vidObj = cv2.VideoCapture(url)
+    try:
+        image, decoded = async_downloader.get_downloader().decode_segments([(url, (index, seek, grab))],
+                                                                          segment_decoder.decode_frame,
+                                                                          segment_cache)[0]
+    except IndexError as e:
+        raise IndexError(str(e) + " for getting frame at " + url)
 
-    success = True
-    image = None
+    instrumentation.recorder.count("frames decoded", decoded)
 
-    while index >= 0 and success:
-        index -= 1
-        success, image = vidObj.read()
+    if return_decoded:
+        return image, decoded
+    else:
+        return image
 
-    if not success:
-        raise IndexError("index out of bounds " + str(index + 1) + " for getting frame at " + url)
 
-    # convert to RGB
-    image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+def get_keyframe(url):
+    """
+
+    gets the first keyframe of a video url
+
+    only the keyframe is decoded, and the decoder is reused across
+    segments, which is much cheaper than get_still_frame(url, 0)
+
+    :param url: URL to the video
+    :return: image
+    """
+
+    image = async_downloader.get_downloader().decode_segments([(url, ())],
+                                                              segment_decoder.decode_keyframe,
+                                                              segment_cache)[0]
+
+    instrumentation.recorder.count("frames decoded")
 
     return image
 
@@ -149,37 +150,22 @@ def get_still_frames(url, step=50, frames=300):
 
     gets multiple still frames from a video
 
+    the segment is downloaded once, segments shorter than [frames] return
+    the frames that they have
+
     :param url: url to the vod
     :param step: number of steps between frames
     :param frames: number of frames in the vod (usually 300)
     :return: tensor of still frames
     """
 
-    vidObj = cv2.VideoCapture(url)
+    images, decoded = async_downloader.get_downloader().decode_segments([(url, (step, frames))],
+                                                                        segment_decoder.decode_frames,
+                                                                        segment_cache)[0]
 
-    success = True
+    instrumentation.recorder.count("frames decoded", decoded)
 
-    index = 0
-
-    images = []
-
-    frame_set = range(0, frames, step)
-
-    while index < frames and success:
-
-        success, image = vidObj.read()
-
-        if index in frame_set:
-            images.append(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
-
-        index += 1
-
-    if not success:
-        # try again with fewer frames
-        return get_still_frames(url, step=step, frames=frames-step)
-        # raise Exception("Could not read all frames from URL: ", url)
-
-    return np.array(images)
+    return images
 
 
 def get_training_data(video_id, sampling_rate=constants.sampling_rate):
@@ -192,10 +178,8 @@ def get_training_data(video_id, sampling_rate=constants.sampling_rate):
     :return: None
     """
 
-    access_token = twitch.get_access_token(video_id)
-
-    base_url = get_base_url(video_id, access_token)
-    vods = get_vods(video_id, access_token)
+    base_url = get_base_url(video_id)
+    vods = get_vods(video_id)
 
     for i, vod in enumerate(vods):
 
@@ -0,0 +1,115 @@
+"""
+
+runs timing tests on the web scrapper
+
+"""
+
+import time as t
+
+from src.Data_Collection import web_scrapper
+from src.Data_Collection import segment_decoder
+
+
+def frame_access_benchmark(url,
+                           indices,
+                           reps):
+    """
+
+    compares decoding every frame up to an index against seeking to the
+    keyframe before the index, with and without converting the skipped
+    frames
+
+    :param url: url of the vod to read frames from
+    :param indices: frame indices to request
+    :param reps: the number of times to repeat each request
+    :return: None
+    """
+
+    print("index, seek, grab, frames decoded, time elapsed")
+
+    modes = [(False, False), (False, True), (True, True)]
+
+    for index in indices:
+        for seek, grab in modes:
+
+            decoded = 0
+            time_elapsed = 0
+
+            for i in range(reps):
+
+                t0 = t.time()
+
+                image, decoded = web_scrapper.get_still_frame(url,
+                                                              index,
+                                                              seek=seek,
+                                                              grab=grab,
+                                                              return_decoded=True)
+
+                t1 = t.time()
+
+                time_elapsed += t1 - t0
+
+            # print the results
+            print(index, end=", ")
+            print(seek, end=", ")
+            print(grab, end=", ")
+            print(decoded, end=", ")
+            print(time_elapsed / reps)
+
+
+def keyframe_benchmark(url,
+                       reps):
+    """
+
+    compares the frames per second of decoding the first frame of a
+    segment with get_still_frame(url, 0) against the keyframe decoder
+
+    the decoders are timed on bytes already in memory, then through
+    web_scrapper (with the segment cached)
+
+    :param url: url of the vod to decode
+    :param reps: number of frames to decode with each method
+    :return: None
+    """
+
+    data = web_scrapper.get_segment(url)
+
+    methods = [
+        ("decode_frame", lambda: segment_decoder.decode_frame(data, 0)),
+        ("decode_keyframe", lambda: segment_decoder.decode_keyframe(data)),
+        ("get_still_frame", lambda: web_scrapper.get_still_frame(url, 0)),
+        ("get_keyframe", lambda: web_scrapper.get_keyframe(url))
+    ]
+
+    print("method, frames per second")
+
+    for name, method in methods:
+
+        t0 = t.time()
+
+        for i in range(reps):
+            method()
+
+        t1 = t.time()
+
+        print(name, reps / (t1 - t0), sep=", ")
+
+
+def main():
+    """
+
+    main method
+
+    :return:
+    """
+
+    frame_access_benchmark("http://dqrpb9wgowsf5.cloudfront.net/263b198d0bd2ccda59ad_thunderblunder777_40807505038_1607054997/360p30/0.ts",
+                           [0, 50, 150, 250],
+                           5)
+
+    keyframe_benchmark("http://dqrpb9wgowsf5.cloudfront.net/263b198d0bd2ccda59ad_thunderblunder777_40807505038_1607054997/360p30/0.ts",
+                       100)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+
+Author: Arthur Wesley
+
+identifies the crewmates of end screen frames and votes on the winners,
+shared by the DataCollector and the LiveCollector
+
+"""
+
+import numpy as np
+
+from src import constants
+from src.Data_Collection import frame_buffer
+from src.Data_Collection import instrumentation
+from src.Preprocessing import cropper
+
+
+def identify_crewmates(crewmate_identifier, frames):
+    """
+
+    identifies the crewmates in a tensor of end screen frames with a single
+    call to the crewmate identifier
+
+    :param crewmate_identifier: crewmate identifier model
+    :param frames: uint8 end screen frames
+    :return: array of color probabilities (frames, crewmates, colors)
+    """
+
+    # crop every crewmate out of every frame and identify them all at once
+    with instrumentation.recorder.span("crop", frames=len(frames)):
+        crops = cropper.crop_crewmate_tensor(frames)
+        crops = crops.reshape((-1,) + crops.shape[2:])
+
+    with instrumentation.recorder.span("identify", crewmates=len(crops)):
+        probabilities = crewmate_identifier.predict(frame_buffer.model_input(crops))
+
+    instrumentation.recorder.count("predict calls")
+    instrumentation.recorder.count("crewmates identified", len(crops))
+
+    return probabilities.reshape((len(frames), -1) + probabilities.shape[1:])
+
+
+def log_probabilities(probabilities):
+    """
+
+    sums the log probabilities of the colors in each crewmate slot over
+    every frame
+
+    :param probabilities: array of color probabilities (frames, crewmates,
+                          colors)
+    :return: array of summed log probabilities (crewmates, colors)
+    """
+
+    return np.sum(np.log(np.maximum(probabilities, constants.epsilon)), axis=0)
+
+
+def weighted_winners(probabilities):
+    """
+
+    picks the most likely color of each crewmate slot over every frame
+
+    :param probabilities: array of color probabilities (frames, crewmates,
+                          colors)
+    :return: array of winning colors
+    """
+
+    return np.argmax(log_probabilities(probabilities), axis=1)
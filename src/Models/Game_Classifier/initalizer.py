@@ -14,16 +14,17 @@ from src import constants
 import os
 
 
-def init_nn():
+def init_nn(dimensions=constants.dimensions):
     """
 
     initializes the neural network
 
+    :param dimensions: dimensions of the input images
     :return: game classifier neural network
     """
 
     # input layer
-    input_layer = layers.Input(shape=constants.dimensions + (3,))
+    input_layer = layers.Input(shape=dimensions + (3,))
 
     # 2D convolutions
     convolution =   layers.Conv2D(filters=8, kernel_size=11, strides=5, padding="same")(input_layer)
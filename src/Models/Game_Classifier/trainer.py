@@ -12,12 +12,13 @@ from tensorflow.keras.preprocessing import image_dataset_from_directory
 from src.Models.Game_Classifier import initalizer
 
 
-def train_model(dataset):
+def train_model(dataset, dimensions=constants.dimensions):
     """
 
     creates and trains a model on a limited number of training examples
 
     :param dataset: dataset to train on
+    :param dimensions: dimensions of the images in the dataset
     :return: trained model
     """
 
@@ -25,7 +26,7 @@ def train_model(dataset):
     K.clear_session()
 
     # initialize the model
-    model = initalizer.init_nn()
+    model = initalizer.init_nn(dimensions)
 
     # fit the model
     model.fit(dataset, epochs=40)
@@ -33,25 +34,42 @@ def train_model(dataset):
     return model
 
 
-def main():
+def train_classifier(dimensions, path):
     """
 
-    main method
+    trains a game classifier on images of the specified dimensions and
+    saves it
 
+    :param dimensions: dimensions to resize the images to
+    :param path: path to save the model to
     :return: None
     """
 
-    # print(os.path.exists("Data/Game Classifier/Training Data"))
-
     training_data = image_dataset_from_directory("Data/Game Classifier/Training Data",
-                                                 image_size=constants.dimensions)
-    model = train_model(training_data)
+                                                 image_size=dimensions)
+    model = train_model(training_data, dimensions)
 
     test_data = image_dataset_from_directory("Data/Game Classifier/Test Data",
-                                             image_size=constants.dimensions)
+                                             image_size=dimensions)
 
     model.evaluate(test_data)
-    model.save(constants.game_classifier)
+    model.save(path)
+
+
+def main():
+    """
+
+    main method
+
+    :return: None
+    """
+
+    # print(os.path.exists("Data/Game Classifier/Training Data"))
+
+    train_classifier(constants.dimensions, constants.game_classifier)
+
+    # variant used by the DataCollector's coarse scan
+    train_classifier(constants.res_160p, constants.game_classifier_160p)
 
 
 if __name__ == "__main__":
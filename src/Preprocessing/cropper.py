@@ -6,12 +6,25 @@ Author: Arthur Wesley
 
 import os
 
+import numpy as np
 from PIL import Image
 
 import pytesseract
 
 from src import constants
 
+# boxes around each crewmate in an end screen cropped to winner_identifier_cropping
+crewmate_boxes = [
+    (95, 15, 150, 90),
+    (140, 20, 195, 95),
+    (195, 25, 250, 100),
+    (260, 30, 315, 105),
+    (305, 25, 360, 100),
+    (365, 20, 420, 95),
+    (415, 10, 470, 85),
+    (460, 5, 515, 80)
+]
+
 
 def crop_end_screen(path, start_size, box):
     """
@@ -42,26 +55,34 @@ def crop_crewmates(image):
     :return: List of Cropped images
     """
 
-    boxes = [
-        (95, 15, 150, 90),
-        (140, 20, 195, 95),
-        (195, 25, 250, 100),
-        (260, 30, 315, 105),
-        (305, 25, 360, 100),
-        (365, 20, 420, 95),
-        (415, 10, 470, 85),
-        (460, 5, 515, 80)
-    ]
-
     crops = []
 
-    for i in range(len(boxes)):
+    for i in range(len(crewmate_boxes)):
 
-        crops.append(image.crop(boxes[i]))
+        crops.append(image.crop(crewmate_boxes[i]))
 
     return crops
 
 
+def crop_crewmate_tensor(frames, box=constants.winner_identifier_cropping):
+    """
+
+    crops the crewmates out of a tensor of full end screen frames with
+    array slicing
+
+    equivalent to cropping each frame to [box] and then calling crop_crewmates
+
+    :param frames: array of frames (frames, height, width, channels)
+    :param box: box the crewmate boxes are relative to
+    :return: array of crops (frames, crewmates, height, width, channels)
+    """
+
+    left, top = box[:2]
+
+    return np.stack([frames[:, top + y0:top + y1, left + x0:left + x1]
+                     for x0, y0, x1, y1 in crewmate_boxes], axis=1)
+
+
 def crop_meeting(image):
     """
 
@@ -11,6 +11,7 @@ Neural Network names
 """
 
 game_classifier = "Models/Game Classifier.h5"
+game_classifier_160p = "Models/Game Classifier 160p.h5"
 losing_winner_identifier = "Models/Winner Identifier.h5"
 winning_winner_identifier = "Models/Winner Identifier.h5"
 end_screen_classifier = "Models/End Screen Classifier.h5"
@@ -175,6 +176,78 @@ end_transition_step = 50
 end_screen_samples = 3
 frames_per_vod = 300
 
+# log probability gap between the top two colors of every crewmate slot at
+# which weighted voting stops sampling end screens
+winner_vote_margin = 2.0
+epsilon = 1e-7
+
+# probability that each game state carries on from one sampled vod to the
+# next, used to smooth out single misclassified vods. End screens and
+# meetings are short, so a single vod of either is still believable
+smoothing_stay_probabilities = {
+    "Gameplay": 0.99,
+    "Lobby": 0.99,
+    "Meeting": 0.8,
+    "Other": 0.99,
+    "Over": 0.5
+}
+
+# scene change detection: a sampled vod starts a new scene when enough of
+# its colors or its brightness change, and every [scene_keep_alive] vods are
+# classified even without a scene change
+scene_histogram_bins = 16
+scene_histogram_threshold = 0.3
+scene_difference_threshold = 0.1
+scene_keep_alive = 30
+
+"""
+
+Download Constants
+
+"""
+
+# number of segments downloaded at once by a DataCollector
+download_workers = 8
+
+# on-disk cache of downloaded segments
+segment_cache_directory = "Data/Segment Cache"
+segment_cache_bytes = 10 * 1024 ** 3  # 10 GB
+# bytes each process writes to the cache before counting the segments
+# that other processes wrote
+segment_cache_sync_bytes = 256 * 1024 ** 2  # 256 MB
+
+# number of seconds before access tokens and playlists are fetched again
+metadata_ttl = 15 * 60
+
+# shared HTTP session
+http_pool_size = 16
+http_timeout = (5, 30)  # (connect, read) seconds
+http_retries = 3
+http_backoff = 0.5
+
+# asyncio segment downloader
+async_max_connections = 256
+async_max_connections_per_host = 64
+async_chunk_size = 64 * 1024
+decode_workers = None  # the default of the decode pool
+decode_processes = False  # decode on threads (pyav releases the gil)
+
+# resumable DataCollector checkpoints
+checkpoint_directory = "Data/Checkpoints"
+
+# class probabilities of every frame the collectors have classified
+prediction_store_directory = "Data/Predictions"
+
+# number of frame hashes whose predictions each DataCollector remembers
+prediction_cache_entries = 4096
+
+# seconds between polls of the playlist of a live stream
+live_poll_interval = 2.0
+
+# timing spans and counters of the collectors
+trace_directory = "Data/Traces"
+max_trace_events = 100000
+
 
 def size(res):
     """